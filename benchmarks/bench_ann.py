@@ -0,0 +1,111 @@
+"""
+Benchmark: approximate (IVF) vs exact pickup matching
+
+Builds synthetic galleries of clustered, normalized embeddings (people
+wearing similar clothes form clusters), queries them with noisy copies of
+gallery entries, and reports recall@k of the IVF backend against the
+brute-force result together with per-query latency for both.
+
+Usage:
+    python benchmarks/bench_ann.py [--sizes 10000 50000 100000] [--nprobe 8 16 32]
+"""
+import argparse
+import time
+
+import common  # noqa: F401  (sets up sys.path and env)
+import numpy as np
+
+from services.vector_index import EmbeddingIndex, IVFIndex
+
+
+def make_gallery(size: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Gaussian-mixture embeddings, L2-normalized like ReID features"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    gallery = centers[labels] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    return gallery / np.linalg.norm(gallery, axis=1, keepdims=True)
+
+
+def make_queries(gallery: np.ndarray, count: int, noise: float = 0.3, seed: int = 1) -> np.ndarray:
+    """Noisy re-observations of random gallery entries (same person, new photo)"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(gallery), count, replace=False)
+    queries = gallery[picks] + noise * rng.standard_normal((count, gallery.shape[1])).astype(np.float32) / np.sqrt(gallery.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run_queries(index: EmbeddingIndex, queries: np.ndarray, k: int):
+    """Return (results, per-query latencies in ms)"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([event_id for event_id, _ in index.search(query, k=k)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def recall_at_k(approximate: list, exact: list) -> float:
+    """Fraction of the exact top-k that the approximate search also returned"""
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+    total = sum(len(e) for e in exact)
+    return hits / max(total, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF vs exact pickup matching")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+    
+    results = []
+    for size in args.sizes:
+        gallery = make_gallery(size, args.dim, clusters=max(16, size // 200))
+        queries = make_queries(gallery, args.queries)
+        ids = [str(i) for i in range(size)]
+        
+        exact_index = EmbeddingIndex(dim=args.dim)
+        exact_index.add_many(ids, gallery)
+        exact_results, exact_latencies = run_queries(exact_index, queries, args.k)
+        exact_stats = common.summarize(exact_latencies)
+        print(f"\nGallery {size} x {args.dim}: exact p50 {exact_stats['p50_ms']:.3f} ms, p99 {exact_stats['p99_ms']:.3f} ms")
+        
+        start = time.perf_counter()
+        ivf_index = IVFIndex(dim=args.dim, nlist=args.nlist)
+        ivf_index.add_many(ids, gallery)
+        ivf_index.wait_until_trained()
+        build_s = time.perf_counter() - start
+        print(f"   IVF build (nlist={args.nlist}): {build_s:.2f} s, trained: {ivf_index.is_trained}")
+        
+        for nprobe in args.nprobe:
+            ivf_index.nprobe = nprobe
+            ivf_results, ivf_latencies = run_queries(ivf_index, queries, args.k)
+            ivf_stats = common.summarize(ivf_latencies)
+            recall_k = recall_at_k(ivf_results, exact_results)
+            recall_1 = recall_at_k([r[:1] for r in ivf_results], [r[:1] for r in exact_results])
+            print(
+                f"   nprobe={nprobe:<3} recall@1 {recall_1:.3f}  recall@{args.k} {recall_k:.3f}  "
+                f"p50 {ivf_stats['p50_ms']:.3f} ms  speedup {exact_stats['p50_ms'] / ivf_stats['p50_ms']:.1f}x"
+            )
+            results.append({
+                "gallery_size": size,
+                "dim": args.dim,
+                "k": args.k,
+                "nlist": args.nlist,
+                "nprobe": nprobe,
+                "build_seconds": build_s,
+                "recall_at_1": recall_1,
+                f"recall_at_{args.k}": recall_k,
+                "exact": exact_stats,
+                "ivf": ivf_stats
+            })
+    
+    common.write_results("ann_matching", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: dynamic micro-batching throughput vs latency
+
+Drives a MicroBatcher with N concurrent callers and compares it with
+running every request as its own batch-of-one on the inference pool.
+
+By default the model is simulated with a fixed per-call overhead plus a
+per-item cost (sleeping releases the GIL like a real forward pass), so the
+numbers show the scheduling behaviour on any machine. Use --model reid or
+--model detection to time the real services instead.
+
+Usage:
+    python benchmarks/bench_batching.py [--model synthetic|reid|detection] [--concurrency 1 4 16]
+"""
+import argparse
+import asyncio
+import time
+
+import common
+import numpy as np
+
+from config import settings
+from services.batching import MicroBatcher
+from utils.concurrency import run_inference
+
+
+def synthetic_model(overhead_ms: float, per_item_ms: float):
+    """Batch function whose cost is overhead + per-item work"""
+    def batch_fn(items):
+        time.sleep((overhead_ms + per_item_ms * len(items)) / 1000)
+        return [None for _ in items]
+    return batch_fn
+
+
+def load_model(name: str):
+    """Return (batch_fn, sample_item) for a real service"""
+    rng = np.random.default_rng(0)
+    if name == "reid":
+        from services.reid import ReIDService
+        service = ReIDService()
+        crop = rng.integers(0, 255, (256, 128, 3), dtype=np.uint8)
+        return lambda crops: list(service.extract_embeddings(crops)), crop
+    
+    from services.detection import DetectionService
+    service = DetectionService()
+    frame = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    return service.detect_batch, frame
+
+
+async def drive(call, concurrency: int, requests_per_worker: int) -> dict:
+    """Run `concurrency` workers each issuing sequential requests through call()"""
+    latencies = []
+    
+    async def worker():
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    stats = common.summarize(latencies)
+    stats["throughput_rps"] = len(latencies) / elapsed
+    return stats
+
+
+async def run(args):
+    if args.model == "synthetic":
+        batch_fn = synthetic_model(args.overhead_ms, args.per_item_ms)
+        item = None
+    else:
+        batch_fn, item = load_model(args.model)
+    
+    results = []
+    print(f"Model: {args.model}, max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms, inference workers {settings.inference_workers}")
+    print(f"{'conc':>5} {'mode':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10}")
+    
+    for concurrency in args.concurrency:
+        unbatched = await drive(lambda: run_inference(batch_fn, [item]), concurrency, args.requests)
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, name=args.model)
+        batched = await drive(lambda: batcher.submit(item), concurrency, args.requests)
+        avg_batch = batcher.items_processed / max(batcher.batches_run, 1)
+        await batcher.close()
+        
+        for mode, stats, batch_size in (("unbatched", unbatched, 1.0), ("batched", batched, avg_batch)):
+            print(f"{concurrency:>5} {mode:>9} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {batch_size:>10.2f}")
+        
+        results.append({
+            "concurrency": concurrency,
+            "unbatched": unbatched,
+            "batched": batched,
+            "average_batch_size": avg_batch
+        })
+    
+    common.write_results(f"batching_{args.model}", {
+        "model": args.model,
+        "max_batch_size": args.max_batch_size,
+        "max_wait_ms": args.max_wait_ms,
+        "levels": results
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dynamic micro-batching")
+    parser.add_argument("--model", choices=["synthetic", "reid", "detection"], default="synthetic")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrent worker")
+    parser.add_argument("--max-batch-size", type=int, default=settings.batch_max_size)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.batch_max_wait_ms)
+    parser.add_argument("--overhead-ms", type=float, default=20.0, help="Synthetic per-call cost")
+    parser.add_argument("--per-item-ms", type=float, default=2.0, help="Synthetic per-item cost")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
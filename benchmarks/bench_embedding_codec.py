@@ -0,0 +1,74 @@
+"""
+Benchmark: embedding storage encoding (JSON text vs binary base64)
+
+Measures the bytes stored per embedding and the read-path cost of turning
+fetched rows back into NumPy arrays, comparing the legacy
+json.loads + np.array path with utils.embeddings.decode_embedding.
+
+Usage:
+    python benchmarks/bench_embedding_codec.py [--rows 1000] [--dim 512]
+"""
+import argparse
+import json
+
+import common  # noqa: F401  (sets up sys.path and env)
+import numpy as np
+
+from utils.embeddings import decode_embedding, encode_embedding
+
+
+def legacy_decode(rows: list) -> list:
+    return [np.array(json.loads(row)) for row in rows]
+
+
+def binary_decode(rows: list) -> list:
+    return [decode_embedding(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding storage encodings")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    
+    encodings = {
+        "json": ([json.dumps(e.tolist()) for e in embeddings], legacy_decode),
+        "float32": ([encode_embedding(e, "float32") for e in embeddings], binary_decode),
+        "float16": ([encode_embedding(e, "float16") for e in embeddings], binary_decode),
+    }
+    
+    results = []
+    baseline_ms = None
+    print(f"{args.rows} rows x {args.dim} dims")
+    print(f"{'encoding':>9} {'bytes/row':>10} {'decode p50 (ms)':>16} {'speedup':>8} {'max abs err':>12}")
+    
+    for name, (rows, decode) in encodings.items():
+        bytes_per_row = sum(len(row) for row in rows) / len(rows)
+        stats = common.time_call(decode, rows, repeat=args.repeat, warmup=2)
+        decoded = np.stack(decode(rows))
+        max_error = float(np.abs(decoded - embeddings).max())
+        if baseline_ms is None:
+            baseline_ms = stats["p50_ms"]
+        speedup = baseline_ms / stats["p50_ms"]
+        
+        print(f"{name:>9} {bytes_per_row:>10.0f} {stats['p50_ms']:>16.2f} {speedup:>7.1f}x {max_error:>12.2e}")
+        results.append({
+            "encoding": name,
+            "rows": args.rows,
+            "dim": args.dim,
+            "bytes_per_row": bytes_per_row,
+            "decode": stats,
+            "speedup_p50": speedup,
+            "max_abs_error": max_error
+        })
+    
+    common.write_results("embedding_codec", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Concurrency check: /api/health latency while pickups are in flight
+
+Measures /api/health latency on an idle server, then again while a number
+of concurrent /api/pickup uploads are being processed. With model inference
+and blocking I/O offloaded from the event loop, the two distributions should
+stay close; if handlers block the loop, health latency jumps to the duration
+of a pickup.
+
+Start the API first (uvicorn main:app), then:
+    python benchmarks/bench_health_under_load.py path/to/person.jpg [--concurrency 8]
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import requests
+
+
+def sample_health(base_url: str, stop: threading.Event, interval: float) -> list:
+    """Poll /api/health until stop is set, returning latencies in ms"""
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f"{base_url}/api/health", timeout=30)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def post_pickup(base_url: str, file_path: str) -> float:
+    """Upload file to /api/pickup, returning the request latency in ms"""
+    start = time.perf_counter()
+    with open(file_path, 'rb') as f:
+        files = {'file': (os.path.basename(file_path), f)}
+        requests.post(f"{base_url}/api/pickup", files=files, timeout=120)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /api/health latency under pickup load")
+    parser.add_argument("file", help="Image or video with a visible person")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pickups", type=int, default=32)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between health probes")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    
+    # Idle baseline
+    stop = threading.Event()
+    timer = threading.Timer(args.idle_seconds, stop.set)
+    timer.start()
+    idle = common.summarize(sample_health(args.base_url, stop, args.interval))
+    
+    # Under load
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=args.concurrency + 1) as pool:
+        health_future = pool.submit(sample_health, args.base_url, stop, args.interval)
+        pickup_futures = [pool.submit(post_pickup, args.base_url, args.file) for _ in range(args.pickups)]
+        pickup_latencies = [future.result() for future in pickup_futures]
+        stop.set()
+        loaded = common.summarize(health_future.result())
+    pickups = common.summarize(pickup_latencies)
+    
+    print(f"Pickups: {args.pickups} at concurrency {args.concurrency}, p50 {pickups['p50_ms']:.0f} ms, p95 {pickups['p95_ms']:.0f} ms")
+    print(f"/api/health idle:       p50 {idle['p50_ms']:.1f} ms, p95 {idle['p95_ms']:.1f} ms, max {idle['max_ms']:.1f} ms")
+    print(f"/api/health under load: p50 {loaded['p50_ms']:.1f} ms, p95 {loaded['p95_ms']:.1f} ms, max {loaded['max_ms']:.1f} ms")
+    
+    common.write_results("health_under_load", {
+        "concurrency": args.concurrency,
+        "pickups": pickups,
+        "health_idle": idle,
+        "health_under_load": loaded
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+End-to-end load test: /api/dropoff and /api/pickup at a fixed concurrency
+
+Starts the API in a subprocess against a throwaway SQLite database (uploads,
+journal and alert spool also go to a temporary directory), registers a set
+of synthetic people as dropoffs and then picks them up, with `concurrency`
+requests in flight at a time. Reports per endpoint:
+- throughput (requests/s) and client-side latency percentiles
+- status codes, so rejected uploads are not mistaken for fast ones, and
+  pickup verdicts (same person vs. mismatch)
+- server-side per-stage latency percentiles (from ?timings=true)
+- server memory: RSS before and after each phase and the peak (Linux)
+
+Synthetic people are a textured background with a person-sized block whose
+upper/lower colours identify them; a pickup re-renders the same person with
+fresh noise and a small shift. Stock YOLO does not detect these, so by
+default the server replaces the YOLO model with a synthetic detector that
+reports the block as a person after --detect-ms of simulated inference.
+Everything after detection (ReID, matching, event writes, alert queueing)
+is the real code. Use --detector yolo with --media to load-test real
+detection on your own photos/videos of people.
+
+    python benchmarks/bench_load.py [--concurrency 1 4 16] [--people 64] [--video-fraction 0.25]
+    python benchmarks/bench_load.py --base-url http://localhost:8000 --detector yolo --media person.jpg
+
+With --base-url the harness drives an already running server and does not
+report memory.
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import cv2
+import numpy as np
+import requests
+
+
+class _SyntheticBoxes:
+    """The part of ultralytics' Boxes that DetectionService reads"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _SyntheticResult:
+    def __init__(self, boxes: _SyntheticBoxes):
+        self.boxes = boxes
+
+
+class SyntheticDetector:
+    """
+    Stand-in for the YOLO model: reports the central block of each frame as a person
+
+    Called like an ultralytics model (model(images, verbose=False)) and
+    sleeps overhead_ms + per_image_ms * len(images) to simulate a forward pass.
+    """
+
+    def __init__(self, overhead_ms: float, per_image_ms: float):
+        self.overhead_ms = overhead_ms
+        self.per_image_ms = per_image_ms
+
+    def __call__(self, images, verbose: bool = False):
+        import torch
+
+        images = images if isinstance(images, list) else [images]
+        time.sleep((self.overhead_ms + self.per_image_ms * len(images)) / 1000)
+
+        results = []
+        for image in images:
+            h, w = image.shape[:2]
+            # [x1, y1, x2, y2, conf, cls]; class 0 is person
+            boxes = torch.tensor([[w * 0.3, h * 0.1, w * 0.7, h * 0.95, 0.9, 0.0]])
+            results.append(_SyntheticResult(_SyntheticBoxes(boxes)))
+        return results
+
+
+def render_person(person: int, seed: int, size=(480, 640)) -> np.ndarray:
+    """Frame of synthetic person `person`; seed varies noise and position"""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    frame = rng.integers(60, 140, (h, w, 3), dtype=np.uint8)
+    # Clothing colours are fixed per person
+    upper, lower = np.random.default_rng(person).integers(0, 256, (2, 3))
+
+    dx = int(rng.integers(-w // 40, w // 40 + 1))
+    x1, x2 = int(w * 0.35) + dx, int(w * 0.65) + dx
+    y1, y_mid, y2 = int(h * 0.15), int(h * 0.55), int(h * 0.9)
+    frame[y1:y_mid, x1:x2] = upper
+    frame[y_mid:y2, x1:x2] = lower
+    noise = rng.integers(-20, 21, frame.shape)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def encode_image(frame: np.ndarray) -> bytes:
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def encode_video(person: int, seed: int, work_dir: str, frames: int = 30, size=(480, 640)) -> bytes:
+    """Short MJPG clip of synthetic person `person`"""
+    path = os.path.join(work_dir, f"clip_{person}_{seed}.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (size[1], size[0]))
+    for i in range(frames):
+        writer.write(render_person(person, seed * 1000 + i, size))
+    writer.release()
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def build_uploads(args, work_dir: str, people: list, seed: int) -> list:
+    """(filename, bytes, content_type) per person for one phase"""
+    rng = random.Random(seed)
+    if args.media:
+        media = []
+        for path in args.media:
+            with open(path, 'rb') as f:
+                media.append((os.path.basename(path), f.read(), None))
+        return [media[person % len(media)] for person in people]
+
+    size = tuple(args.resolution[::-1])
+    uploads = []
+    for person in people:
+        if rng.random() < args.video_fraction:
+            uploads.append((f"person_{person}.avi", encode_video(person, seed, work_dir, size=size), "video/x-msvideo"))
+        else:
+            uploads.append((f"person_{person}.jpg", encode_image(render_person(person, seed, size)), "image/jpeg"))
+    return uploads
+
+
+def read_memory_mb(pid: int) -> dict:
+    """Current and peak RSS of pid in MB, from /proc (Linux only)"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    memory["rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+def run_phase(base_url: str, endpoint: str, uploads: list, concurrency: int, pid=None) -> dict:
+    """POST every upload to endpoint with `concurrency` requests in flight"""
+    sessions = threading.local()
+    latencies, statuses, timings, matches = [], {}, {}, {}
+    lock = threading.Lock()
+
+    def post(upload):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        filename, data, content_type = upload
+        start = time.perf_counter()
+        response = sessions.session.post(
+            f"{base_url}{endpoint}",
+            params={"timings": "true"},
+            files={'file': (filename, data, content_type) if content_type else (filename, data)},
+            timeout=300
+        )
+        latency_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(latency_ms)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                body = response.json()
+                for stage, duration_ms in body.get("timings", {}).items():
+                    timings.setdefault(stage, []).append(duration_ms)
+                if "match_result" in body:
+                    verdict = "same_person" if body["match_result"]["is_same_person"] else "mismatch"
+                    matches[verdict] = matches.get(verdict, 0) + 1
+
+    memory_before = read_memory_mb(pid) if pid else {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(post, uploads))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(uploads),
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(uploads) / elapsed,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        # Pickups only: verdicts, to check the workload exercised both paths
+        "matches": matches,
+        "latency": common.summarize(latencies),
+        "stages": {stage: common.summarize(samples) for stage, samples in sorted(timings.items())},
+        "memory_before": memory_before,
+        "memory_after": read_memory_mb(pid) if pid else {}
+    }
+
+
+def start_server(args, port: int, work_dir: str) -> subprocess.Popen:
+    """Run the API (see serve()) with all of its state under work_dir"""
+    env = {
+        **os.environ,
+        "DATABASE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(work_dir, "data", "cycleguard.db"),
+        "EVENT_JOURNAL_PATH": os.path.join(work_dir, "data", "event_journal.jsonl"),
+        "ALERT_SPOOL_DIR": os.path.join(work_dir, "alert_spool"),
+        "CROP_DIR": os.path.join(work_dir, "uploads", "crops"),
+        "TIMING_LOGS": "false"
+    }
+    default_weights = os.path.join(common.ROOT_DIR, "yolov8n.pt")
+    if os.path.exists(default_weights):
+        env.setdefault("YOLO_MODEL_PATH", default_weights)
+
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port), "--detector", args.detector,
+               "--detect-ms", str(args.detect_ms), "--detect-per-image-ms", str(args.detect_per_image_ms)]
+    server = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        common.wait_for(f"http://127.0.0.1:{port}/api/health/ready", time.perf_counter(), args.timeout)
+    except TimeoutError:
+        server.terminate()
+        raise
+    return server
+
+
+def serve(argv: list):
+    """Server side: the API, optionally with the synthetic detector, on uvicorn"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--detector", default="synthetic")
+    parser.add_argument("--detect-ms", type=float, default=20.0)
+    parser.add_argument("--detect-per-image-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    import main as api
+
+    if args.detector == "synthetic":
+        api.detection_service.model = SyntheticDetector(args.detect_ms, args.detect_per_image_ms)
+    uvicorn.run(api.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /api/dropoff and /api/pickup end to end")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--people", type=int, default=64, help="Dropoffs (and pickups) per concurrency level")
+    parser.add_argument("--mismatch-rate", type=float, default=0.1,
+                        help="Fraction of pickups by someone else (alert path)")
+    parser.add_argument("--video-fraction", type=float, default=0.25, help="Fraction of uploads sent as video")
+    parser.add_argument("--resolution", type=int, nargs=2, default=[640, 480], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--detector", choices=["synthetic", "yolo"], default="synthetic")
+    parser.add_argument("--detect-ms", type=float, default=20.0, help="Synthetic detector overhead per call")
+    parser.add_argument("--detect-per-image-ms", type=float, default=5.0, help="Synthetic detector cost per image")
+    parser.add_argument("--media", nargs="+", help="Real images/videos to upload instead of synthetic people")
+    parser.add_argument("--base-url", help="Drive a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.media is None and args.detector == "yolo":
+        print("⚠️  YOLO will not detect the synthetic people; pass --media with real photos")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="cycleguard_load_") as work_dir:
+        for concurrency in args.concurrency:
+            # Fresh server (and empty database) per level so levels do not skew each other
+            server = None if args.base_url else start_server(args, args.port, work_dir)
+            base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+            pid = server.pid if server else None
+            try:
+                # Some cycles are picked up by someone who dropped nothing off (the alert path)
+                rng = random.Random(args.seed)
+                owners = list(range(args.people))
+                collectors = [args.people + i if rng.random() < args.mismatch_rate else i for i in owners]
+                dropoffs = build_uploads(args, work_dir, owners, seed=args.seed * 1000 + concurrency)
+                pickups = build_uploads(args, work_dir, collectors, seed=args.seed * 1000 + concurrency + 500)
+
+                # Warm the request path (connections, first-request allocations) with
+                # people who take no part in the measured phases
+                warm_up = build_uploads(args, work_dir, [2 * args.people + i for i in range(4)], seed=args.seed)
+                run_phase(base_url, "/api/dropoff", warm_up, 1)
+
+                level = {
+                    "concurrency": concurrency,
+                    "dropoff": run_phase(base_url, "/api/dropoff", dropoffs, concurrency, pid),
+                    "pickup": run_phase(base_url, "/api/pickup", pickups, concurrency, pid)
+                }
+                if pid:
+                    level["memory"] = read_memory_mb(pid)
+                level["health"] = requests.get(f"{base_url}/api/health", timeout=30).json()
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait(timeout=30)
+                    # Next level starts from an empty database
+                    for name in os.listdir(work_dir):
+                        shutil.rmtree(os.path.join(work_dir, name), ignore_errors=True)
+
+            results.append(level)
+            for endpoint in ("dropoff", "pickup"):
+                phase = level[endpoint]
+                print(
+                    f"concurrency {concurrency:>3} {endpoint:>7}: {phase['throughput_rps']:6.1f} req/s, "
+                    f"p50 {phase['latency']['p50_ms']:7.1f} ms, p95 {phase['latency']['p95_ms']:7.1f} ms, "
+                    f"p99 {phase['latency']['p99_ms']:7.1f} ms, status {phase['status_codes']}"
+                    + (f", verdicts {phase['matches']}" if phase['matches'] else "")
+                )
+            if "memory" in level:
+                print(f"concurrency {concurrency:>3}  memory: rss {level['memory'].get('rss_mb', 0):.0f} MB, "
+                      f"peak {level['memory'].get('peak_rss_mb', 0):.0f} MB")
+
+    common.write_results(f"load_{args.detector}", {
+        "people": args.people,
+        "video_fraction": args.video_fraction,
+        "mismatch_rate": args.mismatch_rate,
+        "resolution": args.resolution,
+        "levels": results
+    })
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,152 @@
+"""
+Micro-benchmarks: detection, ReID and matching primitives on synthetic inputs
+
+Times each primitive in isolation, with the models loaded once up front:
+- DetectionService.detect_objects per image resolution
+- ReIDService.extract_embedding per crop size, and extract_embeddings per
+  crop count (batched, reported per batch and per crop)
+- ReIDService._simple_feature_extraction (the fallback features) per crop size
+- ReIDService.compute_similarity for one pair, and a linear scan of a gallery
+  with it next to an exact EmbeddingIndex search, per gallery size
+
+Inputs are the synthetic people from bench_load, so no media is needed
+(YOLO weights are downloaded by ultralytics on first use unless
+YOLO_MODEL_PATH points at a local file).
+Results go to benchmarks/results/primitives.json, tagged with the ReID mode
+and device, so runs can be diffed between releases.
+
+    python benchmarks/bench_primitives.py [--only detection reid fallback similarity] [--repeat 50]
+"""
+import argparse
+
+import common
+import numpy as np
+
+from bench_load import render_person
+from config import settings
+from services.detection import DetectionService
+from services.reid import ReIDService
+from services.vector_index import EmbeddingIndex
+
+SECTIONS = ["detection", "reid", "fallback", "similarity"]
+
+
+def make_crop(width: int, height: int, person: int = 0) -> np.ndarray:
+    """Person-like BGR crop of the given size"""
+    frame = render_person(person, seed=person, size=(height * 10 // 8, width * 10 // 4))
+    h, w = frame.shape[:2]
+    crop = frame[int(h * 0.1):int(h * 0.9), int(w * 0.3):int(w * 0.7)]
+    return np.ascontiguousarray(crop[:height, :width])
+
+
+def parse_size(size: str) -> tuple:
+    width, height = size.lower().split("x")
+    return int(width), int(height)
+
+
+def bench_detection(args) -> list:
+    service = DetectionService()
+    service.load()
+    results = []
+    for size in args.resolutions:
+        width, height = parse_size(size)
+        frame = render_person(0, seed=0, size=(height, width))
+        stats = common.time_call(service.detect_objects, frame, repeat=args.repeat, warmup=args.warmup)
+        print(f"detect_objects {size:>10}: p50 {stats['p50_ms']:8.2f} ms, p95 {stats['p95_ms']:8.2f} ms")
+        results.append({"resolution": size, **stats})
+    return results
+
+
+def bench_reid(args, service: ReIDService) -> dict:
+    single = []
+    for size in args.crop_sizes:
+        crop = make_crop(*parse_size(size))
+        stats = common.time_call(service.extract_embedding, crop, repeat=args.repeat, warmup=args.warmup)
+        print(f"extract_embedding {size:>7}: p50 {stats['p50_ms']:8.2f} ms, p95 {stats['p95_ms']:8.2f} ms")
+        single.append({"crop_size": size, **stats})
+
+    batched = []
+    for count in args.crop_counts:
+        crops = [make_crop(128, 256, person) for person in range(count)]
+        stats = common.time_call(service.extract_embeddings, crops, repeat=args.repeat, warmup=args.warmup)
+        per_crop_ms = stats["p50_ms"] / count
+        print(f"extract_embeddings x{count:<4}: p50 {stats['p50_ms']:8.2f} ms ({per_crop_ms:.2f} ms/crop)")
+        batched.append({"crops": count, "p50_per_crop_ms": per_crop_ms, **stats})
+
+    return {"extract_embedding": single, "extract_embeddings": batched}
+
+
+def bench_fallback(args, service: ReIDService) -> list:
+    results = []
+    for size in args.crop_sizes:
+        crop = make_crop(*parse_size(size))
+        stats = common.time_call(service._simple_feature_extraction, crop, repeat=args.repeat, warmup=args.warmup)
+        print(f"_simple_feature_extraction {size:>7}: p50 {stats['p50_ms']:8.3f} ms")
+        results.append({"crop_size": size, **stats})
+    return results
+
+
+def bench_similarity(args, service: ReIDService, dim: int) -> dict:
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(dim).astype(np.float32)
+    pair = common.time_call(service.compute_similarity, query, query.copy(), repeat=args.repeat * 20, warmup=args.warmup)
+    print(f"compute_similarity (dim {dim}): p50 {pair['p50_ms'] * 1000:8.2f} us")
+
+    def scan(gallery):
+        return max(service.compute_similarity(query, embedding) for embedding in gallery)
+
+    galleries = []
+    for size in args.gallery_sizes:
+        gallery = rng.standard_normal((size, dim)).astype(np.float32)
+        index = EmbeddingIndex(dim)
+        index.add_many([str(i) for i in range(size)], gallery)
+
+        # A Python-level scan gets slow quickly; fewer repeats keep large galleries practical
+        scan_repeat = max(3, args.repeat * 100 // size)
+        linear = common.time_call(scan, gallery, repeat=scan_repeat, warmup=1)
+        indexed = common.time_call(index.search, query, repeat=args.repeat, warmup=args.warmup)
+        print(f"gallery {size:>7}: compute_similarity scan p50 {linear['p50_ms']:9.2f} ms, "
+              f"EmbeddingIndex.search p50 {indexed['p50_ms']:7.3f} ms")
+        galleries.append({"gallery_size": size, "compute_similarity_scan": linear, "index_search": indexed})
+
+    return {"dim": dim, "pair": pair, "gallery": galleries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time detection, ReID and matching primitives")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--resolutions", nargs="+", default=["320x240", "640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--crop-sizes", nargs="+", default=["64x128", "128x256", "256x512"])
+    parser.add_argument("--crop-counts", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    reid_service = ReIDService()
+    reid_service.load()
+    results = {
+        "environment": {
+            "yolo_model": settings.yolo_model_path,
+            "reid_model": settings.reid_model_name,
+            "reid_mode": reid_service.mode,
+            "device": str(reid_service.device)
+        }
+    }
+    print(f"ReID mode: {reid_service.mode} on {reid_service.device}")
+
+    if "detection" in args.only:
+        results["detect_objects"] = bench_detection(args)
+    if "reid" in args.only:
+        results.update(bench_reid(args, reid_service))
+    if "fallback" in args.only:
+        results["simple_feature_extraction"] = bench_fallback(args, reid_service)
+    if "similarity" in args.only:
+        dim = len(reid_service.extract_embedding(make_crop(128, 256)))
+        results["compute_similarity"] = bench_similarity(args, reid_service, dim)
+
+    common.write_results("primitives", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Startup benchmark: time until the API port answers and until it is ready
+
+Starts `uvicorn main:app` in a subprocess several times and records:
+- import_s: time to `import main` (should stay well under a second now that
+  torch/ultralytics are imported lazily)
+- live_s: time from process start until /api/health/live answers
+- ready_s: time until /api/health/ready returns 200 (index loaded, models warm)
+- stages: per-stage warm-up durations reported by the readiness endpoint
+
+    python benchmarks/bench_startup.py [--runs 3] [--port 8765]
+
+Uses the SQLite backend unless DATABASE_BACKEND is set in the environment.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+import common
+import requests
+
+
+def time_import() -> float:
+    """Seconds for a fresh interpreter to import main"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=common.ROOT_DIR, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def run_once(port: int, timeout: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=common.ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        live_s = common.wait_for(f"{base_url}/api/health/live", start, timeout)
+        ready_s = common.wait_for(f"{base_url}/api/health/ready", start, timeout)
+        stages = requests.get(f"{base_url}/api/health/ready", timeout=5).json()["stages"]
+        return {"live_s": live_s, "ready_s": ready_s, "stages": stages}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API startup time to liveness and readiness")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    import_s = time_import()
+    print(f"import main: {import_s:.2f}s")
+
+    runs = []
+    for i in range(args.runs):
+        run = run_once(args.port, args.timeout)
+        runs.append(run)
+        print(f"run {i + 1}: live {run['live_s']:.2f}s, ready {run['ready_s']:.2f}s, stages {run['stages']}")
+
+    common.write_results("startup", {
+        "import_s": import_s,
+        "live": common.summarize([run["live_s"] * 1000 for run in runs]),
+        "ready": common.summarize([run["ready_s"] * 1000 for run in runs]),
+        "runs": runs
+    })
+
+
+if __name__ == "__main__":
+    main()
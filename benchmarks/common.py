@@ -0,0 +1,83 @@
+"""
+Shared helpers for the CycleGuard AI benchmark scripts
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# Make the project importable when running `python benchmarks/<script>.py`
+sys.path.insert(0, ROOT_DIR)
+
+# Benchmarks run offline against the embedded SQLite store
+os.environ.setdefault("DATABASE_BACKEND", "sqlite")
+
+
+def summarize(samples_ms: list) -> dict:
+    """Summarize a list of latency samples (milliseconds)"""
+    ordered = sorted(samples_ms)
+    
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "min_ms": ordered[0],
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1]
+    }
+
+
+def time_call(fn, *args, repeat: int = 50, warmup: int = 5, **kwargs) -> dict:
+    """Time fn(*args, **kwargs) and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn(*args, **kwargs)
+    
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    
+    return summarize(samples)
+
+
+def wait_for(url: str, start: float, timeout: float, status: int = 200) -> float:
+    """Poll url until it returns status, returning seconds since start"""
+    import requests
+    
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == status:
+                return time.perf_counter() - start
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not available after {timeout}s")
+
+
+def write_results(name: str, results, output_dir: str = RESULTS_DIR) -> str:
+    """Write benchmark results as JSON so runs can be diffed between releases"""
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{name}.json")
+    payload = {
+        "benchmark": name,
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    with open(output_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"📄 Results written to {output_path}")
+    return output_path
@@ -0,0 +1,72 @@
+"""
+Local stub of the Reka AI chat endpoint for tests and benchmarks
+
+Answers every request with a fixed verdict after a configurable delay, so the
+pickup flow's Reka AI path (latency budget, concurrency limit, fallback) can
+be exercised without network access or an API key.
+
+Run:
+    python benchmarks/reka_stub_server.py --port 8100 --delay-ms 200 --answer "yes, confidence: 0.9"
+
+Then start the API pointing at it:
+    REKA_API_KEY=stub REKA_API_URL=http://localhost:8100/v1/chat uvicorn main:app
+"""
+import argparse
+import asyncio
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Reka AI stub")
+
+app.state.delay_ms = float(os.getenv("REKA_STUB_DELAY_MS", "200"))
+app.state.answer = os.getenv("REKA_STUB_ANSWER", "yes, same person. confidence: 0.9")
+app.state.status_code = int(os.getenv("REKA_STUB_STATUS", "200"))
+app.state.requests = 0
+app.state.in_flight = 0
+app.state.peak_in_flight = 0
+
+
+@app.post("/v1/chat")
+async def chat(request: Request):
+    """Mimic the Reka chat response shape parsed by RekaAIService"""
+    payload = await request.json()
+    app.state.requests += 1
+    app.state.in_flight += 1
+    app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+    try:
+        await asyncio.sleep(app.state.delay_ms / 1000)
+    finally:
+        app.state.in_flight -= 1
+    
+    if app.state.status_code != 200:
+        return JSONResponse(status_code=app.state.status_code, content={"error": "stubbed failure"})
+    
+    images = sum(1 for part in payload["messages"][0]["content"] if part.get("type") == "image_url")
+    return {
+        "choices": [{"message": {"role": "assistant", "content": app.state.answer}}],
+        "stub": {"images_received": images}
+    }
+
+
+@app.get("/stats")
+async def stats():
+    """Number of chat requests served and the most served at once"""
+    return {"requests": app.state.requests, "peak_in_flight": app.state.peak_in_flight}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Run the Reka AI stub server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--delay-ms", type=float, default=app.state.delay_ms)
+    parser.add_argument("--answer", default=app.state.answer)
+    parser.add_argument("--status", type=int, default=app.state.status_code)
+    args = parser.parse_args()
+    
+    app.state.delay_ms = args.delay_ms
+    app.state.answer = args.answer
+    app.state.status_code = args.status
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -3,9 +3,17 @@ from typing import Optional
 
 
 class Settings(BaseSettings):
-    # Supabase
-    supabase_url: str
-    supabase_key: str
+    # Event storage: "supabase" or "sqlite" (embedded, works offline)
+    database_backend: str = "supabase"
+    sqlite_path: str = "data/cycleguard.db"
+    # Write-behind event persistence: events are journaled locally and inserted in batches
+    event_batch_size: int = 64
+    event_flush_interval_ms: float = 50.0
+    event_journal_path: str = "data/event_journal.jsonl"
+    
+    # Supabase (required for the supabase backend)
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
     
     # Telegram
     telegram_bot_token: Optional[str] = None
@@ -18,10 +26,75 @@ class Settings(BaseSettings):
     
     # Reka AI (Optional)
     reka_api_key: Optional[str] = None
+    reka_api_url: str = "https://api.reka.ai/v1/chat"
+    # Latency budget after which the torchreid verdict is used, and max calls in flight
+    reka_timeout_seconds: float = 5.0
+    reka_max_concurrency: int = 4
+    # Verdicts memoized per crop pair (content hash) to avoid repeat calls
+    reka_cache_size: int = 1024
+    reka_cache_ttl_seconds: float = 3600.0
+    
+    # Background alert dispatch: workers, retries (exponential backoff) and on-disk spool
+    alert_workers: int = 2
+    alert_max_attempts: int = 5
+    alert_retry_base_seconds: float = 2.0
+    alert_spool_dir: str = "alert_spool"
+    # Repeat alerts for the same dropoff within this window are sent as one digest (0 disables)
+    alert_coalesce_seconds: float = 60.0
+    # Alert photo: the pickup person crop, downscaled (longest side in px) and re-encoded as JPEG
+    alert_photo_max_side: int = 480
+    alert_photo_quality: int = 80
     
     # Similarity threshold for person matching (0.85 recommended for torchreid)
     similarity_threshold: float = 0.85
     
+    # Pickup matcher backend: "exact" (brute force) or "ivf" (approximate, for large galleries)
+    matcher_backend: str = "exact"
+    ivf_nlist: int = 256
+    ivf_nprobe: int = 16
+    
+    # Embedding storage precision in the database: "float32" or "float16" (half the bytes)
+    embedding_storage_dtype: str = "float32"
+    
+    # Worker pools for blocking work offloaded from the asyncio event loop.
+    # YOLO/torchreid models are shared, so keep inference_workers at 1 unless
+    # the models are known to be safe to call from several threads.
+    inference_workers: int = 1
+    io_workers: int = 8
+    
+    # Dynamic micro-batching: concurrent detection/ReID requests arriving within
+    # batch_max_wait_ms are run together as one batch of up to batch_max_size
+    batching_enabled: bool = True
+    batch_max_size: int = 8
+    batch_max_wait_ms: float = 5.0
+    
+    # Uploads are streamed to disk in chunks; larger uploads are rejected with 413.
+    # Images are decoded from memory, so they get a much smaller cap.
+    max_upload_mb: int = 200
+    max_image_mb: int = 20
+    upload_chunk_kb: int = 1024
+    
+    # Video uploads: frames sampled ("uniform" or "motion") and best person crops fused
+    video_sample_frames: int = 8
+    video_sampling_mode: str = "uniform"
+    video_top_crops: int = 3
+    
+    # Dropoff person crops (JPEG) kept for the Reka AI comparison: LRU size and disk location
+    crop_cache_size: int = 256
+    crop_dir: str = "uploads/crops"
+    
+    # Rolling window (samples per stage) for the latency percentiles in /api/health
+    latency_window_size: int = 1024
+    # How often the database status reported by /api/health is refreshed
+    health_refresh_seconds: float = 5.0
+    # One JSON log line per request with its per-stage timings
+    timing_logs: bool = True
+    
+    # Load and warm up models in the background at startup (otherwise on the first request)
+    model_warmup: bool = True
+    # Pickups wait at most this long for the dropoff index to load before returning 503
+    dropoff_index_wait_seconds: float = 30.0
+    
     # Model paths
     yolo_model_path: str = "yolov8n.pt"
     reid_model_name: str = "osnet_x1_0"
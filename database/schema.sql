@@ -6,7 +6,8 @@ CREATE TABLE IF NOT EXISTS events (
     event_id UUID UNIQUE NOT NULL,
     event_type VARCHAR(20) NOT NULL CHECK (event_type IN ('dropoff', 'pickup')),
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    person_embedding JSONB NOT NULL,
+    -- Base64 of little-endian float32/float16 bytes with a dtype prefix, e.g. 'f4:...'
+    person_embedding TEXT NOT NULL,
     person_bbox JSONB NOT NULL,
     cycle_bbox JSONB,
     image_path TEXT,
@@ -16,6 +17,18 @@ CREATE TABLE IF NOT EXISTS events (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Migration for databases created with JSONB embeddings:
+-- keep legacy rows as their JSON text (still decoded by the API), new rows are written in binary form
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'events' AND column_name = 'person_embedding' AND data_type = 'jsonb'
+    ) THEN
+        ALTER TABLE events ALTER COLUMN person_embedding TYPE TEXT USING person_embedding #>> '{}';
+    END IF;
+END $$;
+
 -- Create index on event_type for faster queries
 CREATE INDEX IF NOT EXISTS idx_events_event_type ON events(event_type);
 
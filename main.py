@@ -1,33 +1,287 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 import cv2
 import numpy as np
+import asyncio
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 from config import settings
 from services.detection import DetectionService
 from services.reid import ReIDService
-from services.database import DatabaseService
+from services.database import create_database_service
 from services.alert import AlertService
+from services.alert_queue import AlertQueue
+from services.event_writer import EventWriter
 from services.reka_ai import RekaAIService
+from services.vector_index import create_embedding_index
+from services.batching import MicroBatcher
+from services.crop_store import CropStore
+from utils.concurrency import run_inference, run_io, shutdown_executors
+from utils.metrics import (
+    stage_latencies,
+    span,
+    start_request_timings,
+    request_timings,
+    log_timings,
+    render_gauges
+)
 from models.event import EventType, MatchResult
 from utils.image_processing import (
-    extract_frame_from_video,
+    extract_frames_from_video,
     validate_image,
     load_image,
-    save_uploaded_file
+    save_uploaded_file,
+    read_uploaded_bytes,
+    upload_path_for,
+    write_upload,
+    decode_image_bytes,
+    encode_jpeg,
+    encode_thumbnail,
+    UploadTooLargeError
 )
 
+# Initialize services (models are loaded by the background warm-up, or on first use)
+detection_service = DetectionService()
+reid_service = ReIDService()
+db_service = create_database_service()
+alert_service = AlertService()
+reka_service = RekaAIService()
+
+# New events are journaled and written to the database in batches
+event_writer = EventWriter(db_service)
+
+
+# Alert-sent updates waiting for their pickup events to reach the database
+pending_alert_marks = set()
+
+
+async def mark_alerts_sent(alert: dict):
+    """Flag every pickup covered by a delivered alert (digests cover several)"""
+    # Runs on its own so an alert worker never waits out a database outage
+    task = asyncio.ensure_future(mark_when_stored(alert.get("event_ids") or [alert["event_id"]]))
+    pending_alert_marks.add(task)
+    task.add_done_callback(pending_alert_marks.discard)
+
+
+async def mark_when_stored(event_ids: list):
+    # The pickups may still be buffered by the event writer, and their rows
+    # only exist once a flush succeeds, so retry while the database is down
+    while not await event_writer.flush():
+        await asyncio.sleep(event_writer.retry_seconds)
+    for event_id in event_ids:
+        await run_io(db_service.mark_alert_sent, event_id)
+
+
+# Alerts are delivered in the background; the event is marked once Telegram accepts it
+alert_queue = AlertQueue(alert_service, on_delivered=mark_alerts_sent)
+
+# Coalesce concurrent detection/ReID requests into batched forward passes
+detection_batcher = MicroBatcher(
+    detection_service.detect_batch,
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    name="detection"
+)
+embedding_batcher = MicroBatcher(
+    lambda crops: list(reid_service.extract_embeddings(crops)),
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    name="reid"
+)
+
+# JPEG person crops saved at dropoff time for the Reka AI comparison
+crop_store = CropStore()
+
+# Resident index of open dropoff embeddings used for pickup matching
+dropoff_index = create_embedding_index()
+
+# Create uploads directory
+os.makedirs("uploads", exist_ok=True)
+
+
+# Liveness is the process answering at all; readiness is models warm and the
+# dropoff index loaded. The port is bound before either warm-up stage runs.
+startup_state = {
+    "started_at": time.monotonic(),
+    "ready": False,
+    "error": None,
+    "stages": {}
+}
+dropoff_index_loaded = asyncio.Event()
+
+
+async def timed_stage(name: str, fn, *args):
+    """Run one warm-up stage, recording its duration in startup_state"""
+    start = time.monotonic()
+    await fn(*args)
+    startup_state["stages"][name] = round(time.monotonic() - start, 3)
+    print(f"✅ Startup stage '{name}' done in {startup_state['stages'][name]:.2f}s")
+
+
+async def load_dropoff_index():
+    """
+    Load every open dropoff embedding into the in-memory index
+    
+    Retries with backoff until the database answers; until then the service
+    stays unready rather than matching pickups against an empty index.
+    Events journaled by a previous run are stored first, so the index sees
+    their dropoffs and the dropoffs their pickups already closed.
+    """
+    delay = 1.0
+    while True:
+        try:
+            if not await event_writer.flush():
+                raise RuntimeError("journaled events could not be written")
+            events = await run_io(db_service.get_open_dropoff_events)
+            break
+        except Exception as e:
+            startup_state["error"] = f"Loading dropoff index failed: {e}"
+            print(f"⚠️  {startup_state['error']}. Retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    startup_state["error"] = None
+    
+    indexed = await run_io(
+        dropoff_index.add_many,
+        [event["event_id"] for event in events],
+        [event["person_embedding"] for event in events]
+    )
+    dropoff_index_loaded.set()
+    print(f"✅ Indexed {indexed} open dropoff events for pickup matching")
+
+
+async def wait_for_dropoff_index():
+    """
+    Wait (bounded) for the dropoff index to finish loading
+    
+    Raises:
+        HTTPException(503) straight away if loading it has failed, or once
+        settings.dropoff_index_wait_seconds have passed
+    """
+    if dropoff_index_loaded.is_set():
+        return
+    if startup_state["error"] is not None:
+        raise HTTPException(status_code=503, detail=f"Dropoff index unavailable: {startup_state['error']}")
+    try:
+        await asyncio.wait_for(dropoff_index_loaded.wait(), timeout=settings.dropoff_index_wait_seconds)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Dropoff index is still loading, retry shortly")
+
+
+async def warm_up_models():
+    """Load YOLO and ReID and run one dummy pass so the first request isn't slow"""
+    await run_inference(detection_service.load)
+    await run_inference(reid_service.load)
+    await run_inference(detection_service.detect, np.zeros((640, 640, 3), dtype=np.uint8))
+    await run_inference(reid_service.extract_embedding, np.zeros((256, 128, 3), dtype=np.uint8))
+
+
+async def warm_up():
+    """Background startup work; the API serves liveness while this runs"""
+    try:
+        await timed_stage("dropoff_index", load_dropoff_index)
+        if settings.model_warmup:
+            await timed_stage("models", warm_up_models)
+        startup_state["ready"] = True
+        startup_state["stages"]["total"] = round(time.monotonic() - startup_state["started_at"], 3)
+    except Exception as e:
+        startup_state["error"] = str(e)
+        print(f"⚠️  Startup warm-up failed: {e}")
+
+
+# Latest database status; refreshed in the background so /api/health never
+# waits on the I/O pool it reports on
+database_status = {"backend": None, "connected": False, "checked_at": None}
+
+
+async def refresh_database_status():
+    """Poll db_service.status() every HEALTH_REFRESH_SECONDS"""
+    while True:
+        try:
+            status = await run_io(db_service.status)
+        except Exception as e:
+            status = {"connected": False, "error": str(e)}
+        database_status.clear()
+        database_status.update(status, checked_at=datetime.utcnow().isoformat())
+        await asyncio.sleep(settings.health_refresh_seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Quick local replays only: journaled events first so the index sees them,
+    # then alerts spooled before the last shutdown
+    await event_writer.start()
+    await alert_queue.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    status_task = asyncio.create_task(refresh_database_status())
+    
+    yield
+    
+    # Let in-flight model and I/O calls finish before exiting
+    for task in (warm_up_task, status_task):
+        task.cancel()
+    await asyncio.gather(warm_up_task, status_task, return_exceptions=True)
+    await detection_batcher.close()
+    await embedding_batcher.close()
+    await reka_service.close()
+    await alert_queue.stop()
+    await event_writer.close()
+    if pending_alert_marks:
+        # Done straight away if the final flush reached the database
+        _, unfinished = await asyncio.wait(pending_alert_marks, timeout=event_writer.retry_seconds * 2)
+        for task in unfinished:
+            task.cancel()
+    if pending_writes:
+        await asyncio.gather(*pending_writes, return_exceptions=True)
+    shutdown_executors()
+
+
 app = FastAPI(
     title="CycleGuard AI",
     description="AI-powered surveillance system for cycle/escooter security",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+
+# Probes and scrapes are polled constantly; keep them out of latencies and logs
+UNTRACED_ROUTES = {"/api/health", "/api/health/live", "/api/health/ready", "/metrics"}
+
+
+@app.middleware("http")
+async def trace_request(request, call_next):
+    """
+    Collect span timings for the request, record its end-to-end latency per
+    route (e.g. 'POST /api/pickup') and emit one structured log line
+    """
+    start = time.perf_counter()
+    start_request_timings()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        if route is not None and route.path not in UNTRACED_ROUTES:
+            name = f"{request.method} {route.path}"
+            duration_ms = (time.perf_counter() - start) * 1000
+            stage_latencies.observe(name, duration_ms)
+            log_timings({
+                "event": "request",
+                "route": name,
+                "status": status_code,
+                "duration_ms": round(duration_ms, 3),
+                "timings": request_timings()
+            })
+
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,15 +291,195 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-detection_service = DetectionService()
-reid_service = ReIDService()
-db_service = DatabaseService()
-alert_service = AlertService()
-reka_service = RekaAIService()
 
-# Create uploads directory
-os.makedirs("uploads", exist_ok=True)
+async def detect_image(image: np.ndarray) -> dict:
+    """Run detection on image, micro-batched with concurrent requests when enabled"""
+    with span("detection"):
+        if settings.batching_enabled:
+            return await detection_batcher.submit(image)
+        return await run_inference(detection_service.detect, image)
+
+
+async def extract_embedding(person_crop: np.ndarray) -> np.ndarray:
+    """Extract a ReID embedding, micro-batched with concurrent requests when enabled"""
+    with span("reid"):
+        if settings.batching_enabled:
+            return await embedding_batcher.submit(person_crop)
+        return await run_inference(reid_service.extract_embedding, person_crop)
+
+
+async def store_upload(file: UploadFile) -> str:
+    """Stream an upload to disk, rejecting files over max_upload_mb with a 413"""
+    try:
+        with span("upload"):
+            return await save_uploaded_file(
+                file,
+                max_bytes=settings.max_upload_mb * 1024 * 1024,
+                chunk_size=settings.upload_chunk_kb * 1024
+            )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+async def read_upload(file: UploadFile) -> bytearray:
+    """Read an image upload into memory, rejecting files over max_image_mb with a 413"""
+    try:
+        with span("upload"):
+            return await read_uploaded_bytes(
+                file,
+                max_bytes=settings.max_image_mb * 1024 * 1024,
+                chunk_size=settings.upload_chunk_kb * 1024
+            )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+# Uploads still being written to disk in the background
+pending_writes = set()
+
+
+def persist_in_background(file_path: str, data):
+    """Write upload bytes to disk on the I/O pool without waiting for it"""
+    task = asyncio.ensure_future(run_io(write_upload, file_path, data))
+    pending_writes.add(task)
+    task.add_done_callback(pending_writes.discard)
+    task.add_done_callback(_report_write_error)
+
+
+def _report_write_error(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error persisting upload: {task.exception()}")
+
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
+
+
+def is_video_upload(file: UploadFile) -> bool:
+    """Check content type and file extension, as content_type might not be reliable"""
+    file_ext = os.path.splitext(file.filename or "")[1].lower()
+    return bool(file.content_type and file.content_type.startswith("video/")) or file_ext in VIDEO_EXTENSIONS
+
+
+async def analyze_upload(file: UploadFile):
+    """
+    Store an uploaded image or video and run detection and ReID on it
+    
+    Videos are streamed to disk first (frames are decoded from the file).
+    Images are decoded straight from the uploaded bytes while the original is
+    persisted in the background, so inference never waits on disk.
+    
+    Returns:
+        (file_path, detections, person_embedding) where detections is a
+        detect()-style dict for the best person found
+    
+    Raises:
+        HTTPException(400) if the upload is invalid or no person can be cropped,
+        HTTPException(413) if it is too large
+    """
+    if is_video_upload(file):
+        file_path = await store_upload(file)
+        detections, person_embedding = await analyze_video(file_path)
+        return file_path, detections, person_embedding
+    
+    data = await read_upload(file)
+    # Hashing the upload (for its content-addressed path) and decoding it both
+    # scale with its size, so both run on the I/O pool, side by side
+    file_path, image = await asyncio.gather(
+        run_io(upload_path_for, data, file.filename),
+        run_io(decode_image_bytes, data)
+    )
+    persist_in_background(file_path, data)
+    
+    if not validate_image(image):
+        raise HTTPException(status_code=400, detail="Invalid image or video")
+    
+    # Detect person and cycle, and crop the person, in a single YOLO pass
+    detections = await detect_image(image)
+    ensure_person_crop(detections)
+    
+    person_embedding = await extract_embedding(detections['person_crop'])
+    return file_path, detections, person_embedding
+
+
+async def analyze_video(file_path: str):
+    """
+    Sample several frames, detect on them as one batch and fuse the best
+    person crops into a single embedding, so one occluded frame doesn't fail
+    the whole upload
+    """
+    with span("video_decode"):
+        frames = await run_io(
+            extract_frames_from_video,
+            file_path,
+            num_frames=settings.video_sample_frames,
+            mode=settings.video_sampling_mode
+        )
+    frames = [frame for frame in frames if validate_image(frame)]
+    
+    if not frames:
+        raise HTTPException(status_code=400, detail="Invalid image or video")
+    
+    with span("detection"):
+        frame_detections = await run_inference(detection_service.detect_batch, frames)
+    
+    # Best person crops across all frames, by detection confidence
+    with_person = [d for d in frame_detections if d['person_crop'] is not None]
+    with_person.sort(key=lambda d: d['person_confidence'], reverse=True)
+    best = with_person[:settings.video_top_crops]
+    
+    if not best:
+        # No frame has a usable person crop, so this raises the matching 400
+        ensure_person_crop(frame_detections[0])
+    
+    with span("reid"):
+        embeddings = await run_inference(reid_service.extract_embeddings, [d['person_crop'] for d in best])
+    person_embedding = reid_service.aggregate_embeddings(embeddings, weights=[d['person_confidence'] for d in best])
+    
+    # Report the best person frame, with the most confident cycle seen in any frame
+    detections = dict(best[0])
+    with_cycle = [d for d in frame_detections if d['cycle'] is not None]
+    if with_cycle:
+        best_cycle = max(with_cycle, key=lambda d: d['cycle_confidence'])
+        detections['cycle'] = best_cycle['cycle']
+        detections['cycle_confidence'] = best_cycle['cycle_confidence']
+    
+    return detections, person_embedding
+
+
+def ensure_person_crop(detections: dict):
+    """Raise a 400 unless detections contain a usable person crop"""
+    if detections['person'] is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No person detected in image/video. Please ensure a person is clearly visible."
+        )
+    
+    if detections['person_crop'] is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not crop person from image/video"
+        )
+
+
+async def load_legacy_dropoff_crop(event_id: str) -> Optional[bytes]:
+    """
+    Rebuild the person crop for a dropoff recorded before crops were stored
+    
+    Reloads the dropoff image and re-runs detection once, then keeps the
+    crop in the crop store so later pickups don't repeat the work.
+    """
+    matched_event = await run_io(db_service.get_event, event_id)
+    if not matched_event or not matched_event.get('image_path'):
+        return None
+    
+    dropoff_image = await run_io(load_image, matched_event['image_path'])
+    dropoff_person_crop = (await detect_image(dropoff_image))['person_crop']
+    if dropoff_person_crop is None:
+        return None
+    
+    crop_jpeg = await run_io(encode_jpeg, dropoff_person_crop)
+    persist_in_background(crop_store.put(event_id, crop_jpeg), crop_jpeg)
+    return crop_jpeg
 
 
 @app.get("/")
@@ -64,75 +498,48 @@ async def root():
 
 
 @app.post("/api/dropoff")
-async def register_dropoff(file: UploadFile = File(...)):
+async def register_dropoff(file: UploadFile = File(...), timings: bool = False):
     """
     Register a drop-off event (person parks cycle/escooter)
     
     Accepts image or video file
     """
     try:
-        # Save uploaded file
-        file_path = await save_uploaded_file(file)
-        
-        # Load image (handle video if needed)
-        # Check file extension as content_type might not be reliable
-        file_ext = os.path.splitext(file_path)[1].lower()
-        video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
-        
-        if file.content_type and file.content_type.startswith("video/") or file_ext in video_extensions:
-            # Extract middle frame from video for better detection
-            image = extract_frame_from_video(file_path, frame_index=None)
-        else:
-            image = load_image(file_path)
-        
-        if not validate_image(image):
-            raise HTTPException(status_code=400, detail="Invalid image or video")
-        
-        # Detect person and cycle
-        detections = detection_service.detect_objects(image)
-        
-        if detections['person'] is None:
-            raise HTTPException(
-                status_code=400,
-                detail="No person detected in image/video. Please ensure a person is clearly visible."
-            )
-        
-        # Crop person and extract embedding
-        person_crop, person_bbox = detection_service.detect_and_crop_person(image)
-        
-        if person_crop is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not crop person from image/video"
-            )
-        
-        # Extract person embedding
-        person_embedding = reid_service.extract_embedding(person_crop)
+        # Store the upload, detect person/cycle and extract the person embedding
+        file_path, detections, person_embedding = await analyze_upload(file)
+        person_bbox = detections['person']
         
         # Create event
         event_data = {
             "event_type": EventType.DROPOFF.value,
-            "person_embedding": person_embedding.tolist(),
+            "person_embedding": person_embedding,
             "person_bbox": person_bbox,
             "cycle_bbox": detections.get('cycle'),
             "image_path": file_path
         }
         
-        event_id = db_service.create_event(event_data)
+        with span("event_write"):
+            event_id = await event_writer.submit(event_data)
+        dropoff_index.add(event_id, person_embedding)
         
-        return JSONResponse(
-            status_code=200,
-            content={
-                "event_id": event_id,
-                "status": "success",
-                "person_embedding_id": event_id,
-                "message": "Drop-off event recorded successfully",
-                "detections": {
-                    "person_detected": detections['person'] is not None,
-                    "cycle_detected": detections['cycle'] is not None
-                }
+        # Keep the JPEG person crop for the Reka AI comparison at pickup time
+        crop_jpeg = await run_io(encode_jpeg, detections['person_crop'])
+        persist_in_background(crop_store.put(event_id, crop_jpeg), crop_jpeg)
+        
+        content = {
+            "event_id": event_id,
+            "status": "success",
+            "person_embedding_id": event_id,
+            "message": "Drop-off event recorded successfully",
+            "detections": {
+                "person_detected": detections['person'] is not None,
+                "cycle_detected": detections['cycle'] is not None
             }
-        )
+        }
+        if timings:
+            content["timings"] = request_timings()
+        
+        return JSONResponse(status_code=200, content=content)
         
     except HTTPException:
         raise
@@ -141,55 +548,26 @@ async def register_dropoff(file: UploadFile = File(...)):
 
 
 @app.post("/api/pickup")
-async def register_pickup(file: UploadFile = File(...)):
+async def register_pickup(file: UploadFile = File(...), timings: bool = False):
     """
     Register a pickup event (person attempts to pick up cycle/escooter)
     
     Compares with recent dropoff events and sends alert if different person
     """
     try:
-        # Save uploaded file
-        file_path = await save_uploaded_file(file)
-        
-        # Load image (handle video if needed)
-        # Check file extension as content_type might not be reliable
-        file_ext = os.path.splitext(file_path)[1].lower()
-        video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
-        
-        if file.content_type and file.content_type.startswith("video/") or file_ext in video_extensions:
-            # Extract middle frame from video for better detection
-            image = extract_frame_from_video(file_path, frame_index=None)
-        else:
-            image = load_image(file_path)
-        
-        if not validate_image(image):
-            raise HTTPException(status_code=400, detail="Invalid image or video")
+        # Store the upload, detect person/cycle and extract the person embedding
+        file_path, detections, pickup_embedding = await analyze_upload(file)
+        person_crop = detections['person_crop']
+        person_bbox = detections['person']
         
-        # Detect person and cycle
-        detections = detection_service.detect_objects(image)
+        # Matching against a partially loaded index could raise false alerts
+        await wait_for_dropoff_index()
         
-        if detections['person'] is None:
-            raise HTTPException(
-                status_code=400,
-                detail="No person detected in image/video. Please ensure a person is clearly visible."
-            )
-        
-        # Crop person and extract embedding
-        person_crop, person_bbox = detection_service.detect_and_crop_person(image)
-        
-        if person_crop is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not crop person from image/video"
-            )
-        
-        # Extract person embedding
-        pickup_embedding = reid_service.extract_embedding(person_crop)
-        
-        # Get recent dropoff events for comparison
-        dropoff_events = db_service.get_recent_dropoff_events(limit=10)
+        # Find the closest open dropoff in the resident embedding index
+        with span("match"):
+            matches = dropoff_index.search(pickup_embedding, k=1)
         
-        if not dropoff_events:
+        if not matches:
             # No dropoff events to compare with
             match_result = MatchResult(
                 is_same_person=False,
@@ -198,17 +576,7 @@ async def register_pickup(file: UploadFile = File(...)):
                 matched_event_id=None
             )
         else:
-            # Compare with all dropoff events and find best match
-            best_similarity = 0.0
-            best_match_event_id = None
-            
-            for dropoff_event in dropoff_events:
-                dropoff_embedding = np.array(dropoff_event['person_embedding'])
-                similarity = reid_service.compute_similarity(pickup_embedding, dropoff_embedding)
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match_event_id = dropoff_event['event_id']
+            best_match_event_id, best_similarity = matches[0]
             
             # Determine if same person based on threshold
             is_same_person = best_similarity >= settings.similarity_threshold
@@ -225,36 +593,33 @@ async def register_pickup(file: UploadFile = File(...)):
             # Only if Reka AI is configured and available
             use_reka = False
             if reka_service.is_configured() and (confidence == "medium" or (0.6 <= best_similarity < 0.75)):
-                # Get the full matched dropoff event from database to access image_path
-                matched_event = db_service.get_event(best_match_event_id)
-                if matched_event and matched_event.get('image_path'):
-                    try:
-                        dropoff_image = load_image(matched_event['image_path'])
-                        # Get person crop from dropoff image
-                        dropoff_person_crop, _ = detection_service.detect_and_crop_person(dropoff_image)
+                try:
+                    # Dropoff crop was saved at dropoff time, so no reload or re-detection
+                    with span("crop_lookup"):
+                        dropoff_crop_jpeg = await run_io(crop_store.get, best_match_event_id)
+                        if dropoff_crop_jpeg is None:
+                            dropoff_crop_jpeg = await load_legacy_dropoff_crop(best_match_event_id)
+                    
+                    if dropoff_crop_jpeg is not None:
+                        pickup_crop_jpeg = await run_io(encode_jpeg, person_crop)
                         
-                        if dropoff_person_crop is not None:
-                            # Convert to bytes for Reka AI
-                            import cv2
-                            _, dropoff_buffer = cv2.imencode('.jpg', dropoff_person_crop)
-                            _, pickup_buffer = cv2.imencode('.jpg', person_crop)
-                            
-                            # Call Reka AI
-                            reka_result = reka_service.analyze_person_similarity(
-                                dropoff_buffer.tobytes(),
-                                pickup_buffer.tobytes()
+                        # Call Reka AI (None if it misses the latency budget)
+                        with span("reka"):
+                            reka_result = await reka_service.analyze_person_similarity_async(
+                                dropoff_crop_jpeg,
+                                pickup_crop_jpeg
                             )
-                            
-                            if reka_result:
-                                use_reka = True
-                                # Override with Reka AI result if confidence is higher
-                                if reka_result['confidence'] > 0.7:
-                                    is_same_person = reka_result['is_same_person']
-                                    confidence = "high" if reka_result['confidence'] > 0.8 else "medium"
-                                    best_similarity = reka_result['confidence']  # Update similarity with Reka confidence
-                    except Exception as e:
-                        print(f"Error using Reka AI: {e}")
-                        # Continue with torchreid result (graceful fallback)
+                        
+                        if reka_result:
+                            use_reka = True
+                            # Override with Reka AI result if confidence is higher
+                            if reka_result['confidence'] > 0.7:
+                                is_same_person = reka_result['is_same_person']
+                                confidence = "high" if reka_result['confidence'] > 0.8 else "medium"
+                                best_similarity = reka_result['confidence']  # Update similarity with Reka confidence
+                except Exception as e:
+                    print(f"Error using Reka AI: {e}")
+                    # Continue with torchreid result (graceful fallback)
             
             match_result = MatchResult(
                 is_same_person=is_same_person,
@@ -263,48 +628,71 @@ async def register_pickup(file: UploadFile = File(...)):
                 matched_event_id=best_match_event_id
             )
         
-        # Create pickup event
+        # Create pickup event with its match result in a single write
+        # (alert_sent is set once the alert is delivered)
         event_data = {
             "event_type": EventType.PICKUP.value,
-            "person_embedding": pickup_embedding.tolist(),
+            "person_embedding": pickup_embedding,
             "person_bbox": person_bbox,
             "cycle_bbox": detections.get('cycle'),
-            "image_path": file_path
+            "image_path": file_path,
+            "match_result": {
+                "is_same_person": match_result.is_same_person,
+                "similarity_score": match_result.similarity_score,
+                "confidence": match_result.confidence,
+                "matched_event_id": match_result.matched_event_id
+            },
+            "alert_sent": False
         }
         
-        event_id = db_service.create_event(event_data)
+        with span("event_write"):
+            event_id = await event_writer.submit(event_data)
         
-        # Update event with match result
-        alert_sent = False
+        alert_queued = False
         if not match_result.is_same_person:
-            # Send alert for unauthorized pickup
-            alert_sent = alert_service.send_security_alert(
-                event_id=event_id,
-                similarity_score=match_result.similarity_score,
-                image_path=file_path
-            )
+            # Queue alert for unauthorized pickup; delivery happens in the background.
+            # Attach a small JPEG of the person crop rather than the original upload.
+            with span("alert_enqueue"):
+                alert_photo = await run_io(
+                    encode_thumbnail,
+                    person_crop,
+                    max_side=settings.alert_photo_max_side,
+                    quality=settings.alert_photo_quality
+                )
+                alert_queued = await alert_queue.enqueue(
+                    event_id=event_id,
+                    similarity_score=match_result.similarity_score,
+                    image_path=file_path,
+                    photo=alert_photo,
+                    # Repeat attempts on the same dropoff are coalesced into one digest
+                    group_key=match_result.matched_event_id
+                )
         
-        db_service.update_event_match_result(event_id, match_result, alert_sent)
+        # The owner collected their cycle, so the dropoff no longer needs matching
+        if match_result.is_same_person and match_result.matched_event_id:
+            dropoff_index.remove(match_result.matched_event_id)
         
-        return JSONResponse(
-            status_code=200,
-            content={
-                "event_id": event_id,
-                "status": "success",
-                "match_result": {
-                    "is_same_person": match_result.is_same_person,
-                    "similarity_score": match_result.similarity_score,
-                    "confidence": match_result.confidence,
-                    "matched_event_id": match_result.matched_event_id
-                },
-                "alert_sent": alert_sent,
-                "message": "Pickup event processed successfully",
-                "detections": {
-                    "person_detected": detections['person'] is not None,
-                    "cycle_detected": detections['cycle'] is not None
-                }
+        content = {
+            "event_id": event_id,
+            "status": "success",
+            "match_result": {
+                "is_same_person": match_result.is_same_person,
+                "similarity_score": match_result.similarity_score,
+                "confidence": match_result.confidence,
+                "matched_event_id": match_result.matched_event_id
+            },
+            "alert_sent": alert_queued,
+            "alert_status": "queued" if alert_queued else "not_sent",
+            "message": "Pickup event processed successfully",
+            "detections": {
+                "person_detected": detections['person'] is not None,
+                "cycle_detected": detections['cycle'] is not None
             }
-        )
+        }
+        if timings:
+            content["timings"] = request_timings()
+        
+        return JSONResponse(status_code=200, content=content)
         
     except HTTPException:
         raise
@@ -313,17 +701,25 @@ async def register_pickup(file: UploadFile = File(...)):
 
 
 @app.get("/api/events")
-async def get_events(limit: int = 100, offset: int = 0):
-    """Get all events with pagination"""
+async def get_events(limit: int = Query(100, ge=1, le=1000), before: Optional[str] = None, include_embeddings: bool = False):
+    """
+    Get events newest first with keyset pagination
+    
+    Pass the returned next_cursor as `before` to fetch the next page.
+    Embeddings are omitted unless include_embeddings=true.
+    """
     try:
-        events = db_service.get_all_events(limit=limit, offset=offset)
+        # Include events still buffered by the event writer
+        await event_writer.flush()
+        events = await run_io(db_service.get_all_events, limit=limit, before=before, include_embeddings=include_embeddings)
+        next_cursor = events[-1]["timestamp"] if events and len(events) == limit else None
         return JSONResponse(
             status_code=200,
             content={
                 "events": events,
                 "count": len(events),
                 "limit": limit,
-                "offset": offset
+                "next_cursor": next_cursor
             }
         )
     except Exception as e:
@@ -334,7 +730,8 @@ async def get_events(limit: int = 100, offset: int = 0):
 async def get_event(event_id: str):
     """Get specific event by ID"""
     try:
-        event = db_service.get_event(event_id)
+        await event_writer.flush()
+        event = await run_io(db_service.get_event, event_id)
         if event is None:
             raise HTTPException(status_code=404, detail="Event not found")
         return JSONResponse(status_code=200, content=event)
@@ -346,19 +743,97 @@ async def get_event(event_id: str):
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+    
+    Reports the mode each backend is actually running in, queue depths and
+    rolling p50/p95/p99 latencies per pipeline stage. status is "starting"
+    during warm-up, "degraded" if a backend fell back or is unreachable.
+    Only reads in-process state, so it answers even when every pool is busy.
+    """
+    database = {**database_status, "writes_failing": not event_writer.last_flush_ok}
+    
+    degraded = (
+        reid_service.mode == "fallback"
+        or not database["connected"]
+        or database["writes_failing"]
+        or startup_state["error"] is not None
+    )
+    if not startup_state["ready"] and startup_state["error"] is None:
+        status = "starting"
+    else:
+        status = "degraded" if degraded else "healthy"
+    
     return {
-        "status": "healthy",
+        "status": status,
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "detection": "ready",
-            "reid": "ready",
-            "database": "ready",
-            "alert": "ready"
-        }
+            "detection": "ready" if detection_service.is_loaded else "loading",
+            "reid": reid_service.mode,
+            "database": database,
+            "matcher": {
+                "backend": type(dropoff_index).__name__,
+                "loaded": dropoff_index_loaded.is_set(),
+                "size": len(dropoff_index)
+            },
+            "reka": {
+                "configured": reka_service.is_configured(),
+                "cache": reka_service.cache_stats()
+            },
+            "alert": {
+                "configured": alert_service.is_configured(),
+                "delivered": alert_queue.delivered,
+                "failed": alert_queue.failed
+            }
+        },
+        "queues": {
+            "detection_batcher": detection_batcher.qsize(),
+            "embedding_batcher": embedding_batcher.qsize(),
+            "event_writer": event_writer.qsize(),
+            "alerts": alert_queue.qsize(),
+            "background_writes": len(pending_writes)
+        },
+        "latency": stage_latencies.summary()
     }
 
 
+@app.get("/api/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the dropoff index is loaded and models are warm"""
+    content = {
+        "status": "ready" if startup_state["ready"] else "starting",
+        "uptime_seconds": round(time.monotonic() - startup_state["started_at"], 3),
+        "stages": startup_state["stages"],
+        "error": startup_state["error"]
+    }
+    return JSONResponse(status_code=200 if startup_state["ready"] else 503, content=content)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage/route latency histograms, queue depths and readiness"""
+    lines = stage_latencies.render_prometheus()
+    lines += render_gauges({
+        "cycleguard_ready": ("1 once warm-up has finished", startup_state["ready"]),
+        "cycleguard_dropoff_index_size": ("Open dropoffs in the matching index", len(dropoff_index)),
+        "cycleguard_detection_batcher_queue": ("Detection requests waiting for a batch", detection_batcher.qsize()),
+        "cycleguard_embedding_batcher_queue": ("ReID requests waiting for a batch", embedding_batcher.qsize()),
+        "cycleguard_event_writer_queue": ("Events journaled but not yet written to the database", event_writer.qsize()),
+        "cycleguard_alert_queue": ("Alerts waiting for a delivery worker", alert_queue.qsize()),
+        "cycleguard_background_writes": ("Upload and crop writes in flight", len(pending_writes)),
+        "cycleguard_alerts_delivered": ("Alerts delivered since start", alert_queue.delivered),
+        "cycleguard_alerts_failed": ("Alerts given up on since start", alert_queue.failed),
+        "cycleguard_reid_fallback": ("1 if ReID uses histogram features instead of torchreid", reid_service.mode == "fallback")
+    })
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,7 +1,8 @@
 from .detection import DetectionService
 from .reid import ReIDService
 from .database import DatabaseService
+from .sqlite_database import SQLiteDatabaseService
 from .alert import AlertService
 
-__all__ = ["DetectionService", "ReIDService", "DatabaseService", "AlertService"]
+__all__ = ["DetectionService", "ReIDService", "DatabaseService", "SQLiteDatabaseService", "AlertService"]
 
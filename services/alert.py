@@ -1,7 +1,11 @@
-from typing import Optional
+import os
+from typing import List, Optional
 from config import settings
+from utils.metrics import timed
 import requests
 
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
+
 # Try to import Twilio, but continue without it if not available
 try:
     from twilio.rest import Client as TwilioClient
@@ -31,8 +35,25 @@ class AlertService:
         else:
             self.twilio_client = None
     
-    def send_telegram_alert(self, message: str, image_path: Optional[str] = None) -> bool:
-        """Send alert via Telegram"""
+    def is_configured(self) -> bool:
+        """Check if an alert channel (Telegram) is configured"""
+        return bool(self.telegram_token and self.telegram_chat_id)
+    
+    @timed("telegram.send")
+    def send_telegram_alert(
+        self,
+        message: str,
+        image_path: Optional[str] = None,
+        photo: Optional[bytes] = None
+    ) -> bool:
+        """
+        Send alert via Telegram
+        
+        Args:
+            message: Alert text (used as the photo caption when a photo is attached)
+            image_path: Image file to attach if no photo bytes are given (videos are not attached)
+            photo: JPEG bytes to attach, e.g. a downscaled person crop
+        """
         if not self.telegram_token or not self.telegram_chat_id:
             print("Telegram credentials not configured")
             return False
@@ -40,20 +61,23 @@ class AlertService:
         try:
             base_url = f"https://api.telegram.org/bot{self.telegram_token}"
             
-            if image_path:
+            if photo is None and image_path and self._is_image_file(image_path):
+                with open(image_path, 'rb') as f:
+                    photo = f.read()
+            
+            if photo is not None:
                 # Send photo with caption
-                with open(image_path, 'rb') as photo:
-                    files = {'photo': photo}
-                    data = {
-                        'chat_id': self.telegram_chat_id,
-                        'caption': message
-                    }
-                    response = requests.post(
-                        f"{base_url}/sendPhoto",
-                        files=files,
-                        data=data,
-                        timeout=10
-                    )
+                files = {'photo': ('alert.jpg', photo, 'image/jpeg')}
+                data = {
+                    'chat_id': self.telegram_chat_id,
+                    'caption': message
+                }
+                response = requests.post(
+                    f"{base_url}/sendPhoto",
+                    files=files,
+                    data=data,
+                    timeout=10
+                )
             else:
                 # Send text message
                 response = requests.post(
@@ -94,7 +118,13 @@ class AlertService:
             print(f"Error sending SMS alert: {e}")
             return False
     
-    def send_security_alert(self, event_id: str, similarity_score: float, image_path: Optional[str] = None) -> bool:
+    def send_security_alert(
+        self,
+        event_id: str,
+        similarity_score: float,
+        image_path: Optional[str] = None,
+        photo: Optional[bytes] = None
+    ) -> bool:
         """Send security alert for unauthorized pickup attempt"""
         message = f"🚨 SECURITY ALERT - CycleGuard AI\n\n"
         message += f"⚠️ Unauthorized pickup detected!\n"
@@ -104,10 +134,33 @@ class AlertService:
         message += f"Please verify immediately."
         
         # Try Telegram first, then SMS
-        telegram_sent = self.send_telegram_alert(message, image_path)
+        telegram_sent = self.send_telegram_alert(message, image_path, photo=photo)
         
         # You can also send SMS if phone number is provided
         # sms_sent = self.send_sms_alert(message, "+1234567890")
         
         return telegram_sent
-
+    
+    def send_alert_digest(
+        self,
+        event_ids: List[str],
+        similarity_scores: List[float],
+        window_seconds: float,
+        matched_event_id: Optional[str] = None,
+        photo: Optional[bytes] = None
+    ) -> bool:
+        """Send one summary alert for repeated unauthorized pickups of the same cycle"""
+        message = "🚨 SECURITY ALERT - CycleGuard AI\n\n"
+        message += f"⚠️ {len(event_ids)} more unauthorized pickup attempts in {window_seconds:.0f}s!\n"
+        if matched_event_id:
+            message += f"Dropoff Event ID: {matched_event_id}\n"
+        message += f"Similarity Scores: {min(similarity_scores):.2f} - {max(similarity_scores):.2f}\n"
+        message += f"Latest Event ID: {event_ids[-1]}\n"
+        message += "Please verify immediately."
+        
+        return self.send_telegram_alert(message, photo=photo)
+    
+    @staticmethod
+    def _is_image_file(path: str) -> bool:
+        """Only still images can be sent as a Telegram photo"""
+        return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
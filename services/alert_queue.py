@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from config import settings
+from utils.concurrency import run_io
+
+
+class AlertQueue:
+    """
+    Background dispatch queue for security alerts
+
+    Alerts are written to a spool directory before being queued, so they
+    survive restarts, and are delivered by worker tasks that retry failed
+    sends with exponential backoff. Callers only wait for the spool write.
+
+    Alerts sharing a group key (the matched dropoff) are coalesced: the first
+    one is sent straight away and opens a window, and any others within
+    coalesce_seconds are folded into a single digest sent when it closes.
+    Alerts without a group key are always sent on their own.
+    """
+
+    def __init__(
+        self,
+        alert_service,
+        spool_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_seconds: Optional[float] = None,
+        coalesce_seconds: Optional[float] = None,
+        on_delivered: Optional[Callable[[dict], None]] = None
+    ):
+        self.alert_service = alert_service
+        self.spool_dir = spool_dir or settings.alert_spool_dir
+        self.failed_dir = os.path.join(self.spool_dir, "failed")
+        self.workers = workers or settings.alert_workers
+        self.max_attempts = max_attempts or settings.alert_max_attempts
+        self.retry_base_seconds = retry_base_seconds if retry_base_seconds is not None else settings.alert_retry_base_seconds
+        self.coalesce_seconds = coalesce_seconds if coalesce_seconds is not None else settings.alert_coalesce_seconds
+        self.on_delivered = on_delivered
+        self.delivered = 0
+        self.failed = 0
+        self.coalesced = 0
+        # Open coalescing windows by group key: {"opened_at", "digest", "lock", "handle"}
+        self._windows: Dict[str, dict] = {}
+        self._window_tasks = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retry_handles = set()
+
+    def qsize(self) -> int:
+        """Alerts waiting for a worker (retries waiting out their backoff not included)"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Re-queue alerts spooled by a previous run and start the workers"""
+        self._queue = asyncio.Queue()
+        spooled = await run_io(self._load_spool)
+        for alert in spooled:
+            self._queue.put_nowait(alert)
+        if spooled:
+            print(f"📨 Re-queued {len(spooled)} spooled alerts")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; undelivered alerts stay in the spool for the next start"""
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        # Pending digests are already spooled, so they go out on the next start
+        self._windows.clear()
+        for task in self._window_tasks:
+            task.cancel()
+        await asyncio.gather(*self._window_tasks, return_exceptions=True)
+        self._window_tasks.clear()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(
+        self,
+        event_id: str,
+        similarity_score: float,
+        image_path: Optional[str] = None,
+        photo: Optional[bytes] = None,
+        group_key: Optional[str] = None
+    ) -> bool:
+        """
+        Spool and queue a security alert for delivery
+        
+        Args:
+            photo: JPEG bytes to attach instead of the original upload; spooled next to the alert
+            group_key: Alerts with the same key (e.g. matched dropoff) are coalesced; None sends it alone
+
+        Returns:
+            True once the alert is durably queued, False if no alert channel is configured
+        """
+        if not self.alert_service.is_configured():
+            print("Telegram credentials not configured")
+            return False
+
+        if group_key is not None and self.coalesce_seconds > 0:
+            window = self._windows.get(group_key)
+            if window is not None:
+                await self._add_to_digest(window, group_key, event_id, similarity_score, image_path, photo)
+                return True
+            self._open_window(group_key)
+
+        alert = self._new_alert(event_id, similarity_score, image_path)
+        if photo is not None:
+            alert["photo_path"] = self._photo_path(alert)
+            await run_io(self._write_photo, alert, photo)
+        await run_io(self._write_spool, alert)
+        self._queue.put_nowait(alert)
+        return True
+
+    def _open_window(self, group_key: str):
+        """Start coalescing group_key; the window closes after coalesce_seconds even if nothing joins it"""
+        loop = asyncio.get_running_loop()
+        handle = loop.call_later(self.coalesce_seconds, self._flush_window, group_key)
+        self._retry_handles.add(handle)
+        self._windows[group_key] = {
+            "opened_at": time.time(),
+            "digest": None,
+            # Serializes digest updates and their spool writes
+            "lock": asyncio.Lock(),
+            "handle": handle
+        }
+
+    async def _add_to_digest(
+        self,
+        window: dict,
+        group_key: str,
+        event_id: str,
+        similarity_score: float,
+        image_path: Optional[str],
+        photo: Optional[bytes]
+    ):
+        """Fold an alert into the window's digest, creating it on the first repeat"""
+        self.coalesced += 1
+        async with window["lock"]:
+            digest = window["digest"]
+            if digest is None:
+                digest = self._new_alert(event_id, similarity_score, image_path)
+                digest["event_ids"] = []
+                digest["similarity_scores"] = []
+                digest["group_key"] = group_key
+                digest["window_seconds"] = self.coalesce_seconds
+                window["digest"] = digest
+
+            digest["event_ids"].append(event_id)
+            digest["similarity_scores"].append(similarity_score)
+            # The digest shows the most recent attempt
+            digest["event_id"] = event_id
+            digest["similarity_score"] = similarity_score
+            digest["image_path"] = image_path
+            if photo is not None:
+                digest["photo_path"] = self._photo_path(digest)
+                await run_io(self._write_photo, digest, photo)
+            await run_io(self._write_spool, digest)
+
+    def _flush_window(self, group_key: str):
+        window = self._windows.pop(group_key, None)
+        if window is None:
+            return
+        self._retry_handles.discard(window["handle"])
+        if window["digest"] is not None:
+            # Queue the digest once any in-flight update has been spooled
+            task = asyncio.ensure_future(self._queue_digest(window))
+            self._window_tasks.add(task)
+            task.add_done_callback(self._window_tasks.discard)
+
+    async def _queue_digest(self, window: dict):
+        async with window["lock"]:
+            self._queue.put_nowait(window["digest"])
+
+    @staticmethod
+    def _new_alert(event_id: str, similarity_score: float, image_path: Optional[str]) -> dict:
+        return {
+            "alert_id": uuid.uuid4().hex,
+            "event_id": event_id,
+            "event_ids": [event_id],
+            "similarity_score": similarity_score,
+            "image_path": image_path,
+            "photo_path": None,
+            "attempts": 0,
+            "created_at": time.time()
+        }
+
+    async def _worker(self):
+        while True:
+            alert = await self._queue.get()
+            try:
+                await self._deliver(alert)
+            except Exception as e:
+                print(f"Error dispatching alert {alert['alert_id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, alert: dict):
+        photo = await run_io(self._read_photo, alert)
+        if "similarity_scores" in alert:
+            sent = await run_io(
+                self.alert_service.send_alert_digest,
+                event_ids=alert["event_ids"],
+                similarity_scores=alert["similarity_scores"],
+                window_seconds=alert["window_seconds"],
+                matched_event_id=alert["group_key"],
+                photo=photo
+            )
+        else:
+            sent = await run_io(
+                self.alert_service.send_security_alert,
+                event_id=alert["event_id"],
+                similarity_score=alert["similarity_score"],
+                image_path=alert.get("image_path"),
+                photo=photo
+            )
+
+        if sent:
+            self.delivered += 1
+            await run_io(self._remove_spool, alert)
+            if asyncio.iscoroutinefunction(self.on_delivered):
+                await self.on_delivered(alert)
+            elif self.on_delivered is not None:
+                await run_io(self.on_delivered, alert)
+            return
+
+        alert["attempts"] += 1
+        if alert["attempts"] >= self.max_attempts:
+            self.failed += 1
+            print(f"⚠️  Giving up on alert {alert['alert_id']} after {alert['attempts']} attempts")
+            await run_io(self._move_to_failed, alert)
+            return
+
+        # Exponential backoff; the worker is free to deliver other alerts meanwhile
+        delay = self.retry_base_seconds * (2 ** (alert["attempts"] - 1))
+        await run_io(self._write_spool, alert)
+        self._schedule_retry(alert, delay)
+
+    def _schedule_retry(self, alert: dict, delay: float):
+        loop = asyncio.get_running_loop()
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            self._queue.put_nowait(alert)
+
+        handle = loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def _spool_path(self, alert: dict) -> str:
+        return os.path.join(self.spool_dir, f"{alert['alert_id']}.json")
+
+    def _photo_path(self, alert: dict) -> str:
+        return os.path.join(self.spool_dir, f"{alert['alert_id']}.jpg")
+
+    def _write_photo(self, alert: dict, photo: bytes):
+        self._write_atomic(alert["photo_path"], photo)
+
+    def _read_photo(self, alert: dict) -> Optional[bytes]:
+        path = alert.get("photo_path")
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _write_spool(self, alert: dict):
+        """Atomically write the alert to the spool and fsync it"""
+        self._write_atomic(self._spool_path(alert), json.dumps(alert).encode())
+
+    def _write_atomic(self, path: str, data: bytes):
+        # A unique temp file per write, so concurrent writes of one digest never share it
+        os.makedirs(self.spool_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.spool_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _remove_spool(self, alert: dict):
+        for path in (self._spool_path(alert), alert.get("photo_path")):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _move_to_failed(self, alert: dict):
+        os.makedirs(self.failed_dir, exist_ok=True)
+        for path in (self._spool_path(alert), alert.get("photo_path")):
+            if path and os.path.exists(path):
+                os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+
+    def _load_spool(self) -> List[dict]:
+        """Alerts left in the spool by a previous run, oldest first"""
+        if not os.path.isdir(self.spool_dir):
+            return []
+
+        alerts = []
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name)) as f:
+                    alerts.append(json.load(f))
+            except Exception as e:
+                print(f"Error reading spooled alert {name}: {e}")
+        alerts.sort(key=lambda alert: alert.get("created_at", 0))
+        return alerts
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+from typing import Any, Callable, List, Optional
+from utils.concurrency import run_inference
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching for model inference
+    
+    Concurrent requests submit single items; items that arrive within
+    max_wait_ms of the first one (up to max_batch_size) are run through
+    batch_fn as one batch on the inference pool, and each caller gets its
+    own result back. While a batch is running, new items queue up and form
+    the next batch, so batches grow naturally with load.
+    """
+    
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 8, max_wait_ms: float = 5.0, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.items_processed = 0
+    
+    def qsize(self) -> int:
+        """Number of items waiting for a batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    async def submit(self, item: Any) -> Any:
+        """Queue item for the next batch and wait for its result"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # The worker serves every caller, so it must not inherit this
+            # caller's context (e.g. its request timings)
+            self._worker = contextvars.Context().run(asyncio.create_task, self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+    
+    async def close(self):
+        """Stop the batching worker (pending callers are cancelled)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            # Collect more items until the batch is full or the window closes
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Callers that gave up (e.g. client disconnected) don't need work done
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            
+            try:
+                results = await run_inference(self.batch_fn, [item for item, _ in batch])
+            except Exception as e:
+                print(f"Error running {self.name} batch of {len(batch)}: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self.batches_run += 1
+            self.items_processed += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
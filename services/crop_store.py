@@ -0,0 +1,47 @@
+import os
+from typing import Optional
+from config import settings
+from utils.cache import LRUCache
+
+
+class CropStore:
+    """
+    JPEG person crops saved at dropoff time, keyed by event ID
+    
+    Recent crops are kept in an LRU cache; every crop is also written to
+    crop_dir so it survives restarts and cache eviction. This lets the Reka AI
+    fallback compare crops without reloading and re-detecting the dropoff image.
+    """
+    
+    def __init__(self, crop_dir: Optional[str] = None, max_size: Optional[int] = None):
+        self.crop_dir = crop_dir or settings.crop_dir
+        self.cache = LRUCache(max_size=max_size or settings.crop_cache_size)
+        os.makedirs(self.crop_dir, exist_ok=True)
+    
+    def path_for(self, event_id: str) -> str:
+        """On-disk location of the crop for event_id"""
+        return os.path.join(self.crop_dir, f"{event_id}.jpg")
+    
+    def put(self, event_id: str, jpeg_bytes: bytes) -> str:
+        """
+        Cache the crop for event_id and return the path it should be persisted to
+        
+        The caller writes the bytes to that path (typically in the background).
+        """
+        self.cache.put(event_id, jpeg_bytes)
+        return self.path_for(event_id)
+    
+    def get(self, event_id: str) -> Optional[bytes]:
+        """Return the JPEG crop for event_id from memory or disk, or None if unknown"""
+        jpeg_bytes = self.cache.get(event_id)
+        if jpeg_bytes is not None:
+            return jpeg_bytes
+        
+        path = self.path_for(event_id)
+        if not os.path.exists(path):
+            return None
+        
+        with open(path, 'rb') as f:
+            jpeg_bytes = f.read()
+        self.cache.put(event_id, jpeg_bytes)
+        return jpeg_bytes
@@ -2,6 +2,9 @@ from typing import List, Optional
 from datetime import datetime
 from models.event import Event, EventType, MatchResult
 from config import settings
+from utils.embeddings import encode_embedding, decode_embedding
+from utils.metrics import timed
+from services.sqlite_database import SQLiteDatabaseService
 import uuid
 import json
 
@@ -19,7 +22,10 @@ class DatabaseService:
     """Service for database operations using Supabase"""
     
     def __init__(self):
-        if SUPABASE_AVAILABLE:
+        if SUPABASE_AVAILABLE and not (settings.supabase_url and settings.supabase_key):
+            self.supabase = None
+            print("⚠️  SUPABASE_URL/SUPABASE_KEY not set. Database operations will be disabled.")
+        elif SUPABASE_AVAILABLE:
             try:
                 self.supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
                 print("✅ Supabase client initialized")
@@ -30,6 +36,10 @@ class DatabaseService:
             self.supabase = None
             print("⚠️  Supabase not available. Using in-memory storage (testing mode).")
     
+    def status(self) -> dict:
+        """Backend name and whether a client is available"""
+        return {"backend": "supabase", "connected": self.supabase is not None}
+    
     def create_event(self, event: dict) -> str:
         """Create a new event in the database"""
         event_id = str(uuid.uuid4())
@@ -38,25 +48,56 @@ class DatabaseService:
             print(f"⚠️  Database not available. Event {event_id} created in memory only.")
             return event_id
         
-        event_data = {
+        # Fallback: return event_id even if database insert fails
+        self.insert_events([{
+            **event,
             "event_id": event_id,
-            "event_type": event["event_type"],
-            "timestamp": datetime.utcnow().isoformat(),
-            "person_embedding": json.dumps(event["person_embedding"]),
-            "person_bbox": json.dumps(event["person_bbox"]),
-            "cycle_bbox": json.dumps(event.get("cycle_bbox")),
-            "image_path": event.get("image_path"),
-            "alert_sent": False
-        }
+            "timestamp": datetime.utcnow().isoformat()
+        }])
+        return event_id
+    
+    @timed("db.insert_events")
+    def insert_events(self, events: List[dict]) -> bool:
+        """
+        Insert fully assembled events (event_id and timestamp already set) in one request
+        
+        Events may carry match_result (a dict) and alert_sent, so a pickup is a
+        single write. Inserts are idempotent on event_id, so a batch can be
+        safely retried.
+        
+        Returns:
+            True if the batch was stored; False (so the caller keeps the events
+            journaled and retries) on errors or when there is no client
+        """
+        if not self.supabase:
+            print(f"⚠️  Database not available. {len(events)} events not stored.")
+            return False
+        
+        rows = [
+            {
+                "event_id": event["event_id"],
+                "event_type": event["event_type"],
+                "timestamp": event["timestamp"],
+                "person_embedding": encode_embedding(event["person_embedding"], settings.embedding_storage_dtype),
+                "person_bbox": json.dumps(event["person_bbox"]),
+                "cycle_bbox": json.dumps(event.get("cycle_bbox")),
+                "image_path": event.get("image_path"),
+                "match_result": json.dumps(event["match_result"]) if event.get("match_result") else None,
+                "alert_sent": event.get("alert_sent", False)
+            }
+            for event in events
+        ]
         
         try:
-            result = self.supabase.table("events").insert(event_data).execute()
-            return event_id
+            self.supabase.table("events")\
+                .upsert(rows, on_conflict="event_id", ignore_duplicates=True)\
+                .execute()
+            return True
         except Exception as e:
-            print(f"Error creating event: {e}")
-            # Fallback: return event_id even if database insert fails
-            return event_id
+            print(f"Error creating events: {e}")
+            return False
     
+    @timed("db.get_recent_dropoff_events")
     def get_recent_dropoff_events(self, limit: int = 10) -> List[dict]:
         """Get recent dropoff events for comparison"""
         if not self.supabase:
@@ -75,7 +116,7 @@ class DatabaseService:
             for row in result.data:
                 events.append({
                     "event_id": row["event_id"],
-                    "person_embedding": json.loads(row["person_embedding"]),
+                    "person_embedding": decode_embedding(row["person_embedding"]),
                     "person_bbox": json.loads(row["person_bbox"]),
                     "timestamp": row["timestamp"]
                 })
@@ -84,6 +125,67 @@ class DatabaseService:
             print(f"Error fetching dropoff events: {e}")
             return []
     
+    @timed("db.get_open_dropoff_events")
+    def get_open_dropoff_events(self, page_size: int = 1000) -> List[dict]:
+        """
+        Get all dropoff events whose cycle has not been picked up yet
+        
+        A dropoff is closed once a pickup event matched it as the same person.
+        
+        Raises:
+            The client's error if a query fails, so callers can retry instead
+            of matching pickups against an empty gallery
+        """
+        if not self.supabase:
+            print("⚠️  Database not available. Cannot fetch dropoff events.")
+            return []
+        
+        try:
+            closed_event_ids = set()
+            for row in self._fetch_all(
+                lambda: self.supabase.table("events")
+                    .select("match_result")
+                    .eq("event_type", EventType.PICKUP.value)
+                    .not_.is_("match_result", "null")
+                    .order("timestamp", desc=True),
+                page_size
+            ):
+                match_result = json.loads(row["match_result"])
+                if match_result.get("is_same_person") and match_result.get("matched_event_id"):
+                    closed_event_ids.add(match_result["matched_event_id"])
+            
+            events = []
+            for row in self._fetch_all(
+                lambda: self.supabase.table("events")
+                    .select("event_id, person_embedding, timestamp")
+                    .eq("event_type", EventType.DROPOFF.value)
+                    .order("timestamp", desc=True),
+                page_size
+            ):
+                if row["event_id"] in closed_event_ids:
+                    continue
+                events.append({
+                    "event_id": row["event_id"],
+                    "person_embedding": decode_embedding(row["person_embedding"]),
+                    "timestamp": row["timestamp"]
+                })
+            return events
+        except Exception as e:
+            print(f"Error fetching open dropoff events: {e}")
+            raise
+    
+    def _fetch_all(self, build_query, page_size: int) -> List[dict]:
+        """Page through every row of a Supabase query built fresh by build_query()"""
+        rows = []
+        offset = 0
+        while True:
+            result = build_query().range(offset, offset + page_size - 1).execute()
+            rows.extend(result.data)
+            if len(result.data) < page_size:
+                return rows
+            offset += page_size
+    
+    @timed("db.update_event_match_result")
     def update_event_match_result(self, event_id: str, match_result: MatchResult, alert_sent: bool = False):
         """Update event with match result"""
         try:
@@ -104,6 +206,21 @@ class DatabaseService:
         except Exception as e:
             print(f"Error updating event match result: {e}")
     
+    @timed("db.mark_alert_sent")
+    def mark_alert_sent(self, event_id: str):
+        """Record that the security alert for event_id was delivered"""
+        if not self.supabase:
+            return
+        
+        try:
+            self.supabase.table("events")\
+                .update({"alert_sent": True})\
+                .eq("event_id", event_id)\
+                .execute()
+        except Exception as e:
+            print(f"Error marking alert sent: {e}")
+    
+    @timed("db.get_event")
     def get_event(self, event_id: str) -> Optional[dict]:
         """Get event by ID"""
         try:
@@ -118,7 +235,7 @@ class DatabaseService:
                     "event_id": row["event_id"],
                     "event_type": row["event_type"],
                     "timestamp": row["timestamp"],
-                    "person_embedding": json.loads(row["person_embedding"]),
+                    "person_embedding": decode_embedding(row["person_embedding"]).tolist(),
                     "person_bbox": json.loads(row["person_bbox"]),
                     "cycle_bbox": json.loads(row.get("cycle_bbox")) if row.get("cycle_bbox") else None,
                     "image_path": row.get("image_path"),
@@ -130,31 +247,70 @@ class DatabaseService:
             print(f"Error getting event: {e}")
             return None
     
-    def get_all_events(self, limit: int = 100, offset: int = 0) -> List[dict]:
-        """Get all events with pagination"""
+    # Columns returned by event listings; person_embedding is only fetched on request
+    SUMMARY_COLUMNS = "event_id, event_type, timestamp, person_bbox, cycle_bbox, image_path, match_result, alert_sent"
+    
+    @timed("db.get_all_events")
+    def get_all_events(self, limit: int = 100, before: Optional[str] = None, include_embeddings: bool = False) -> List[dict]:
+        """
+        Get events newest first with keyset pagination on timestamp
+        
+        Args:
+            limit: Maximum number of events to return
+            before: Only return events older than this timestamp (the last
+                timestamp of the previous page)
+            include_embeddings: Also fetch and decode person embeddings
+        """
         try:
-            result = self.supabase.table("events")\
-                .select("*")\
+            columns = self.SUMMARY_COLUMNS + ", person_embedding" if include_embeddings else self.SUMMARY_COLUMNS
+            query = self.supabase.table("events").select(columns)
+            if before:
+                query = query.lt("timestamp", before)
+            result = query\
                 .order("timestamp", desc=True)\
                 .limit(limit)\
-                .range(offset, offset + limit - 1)\
                 .execute()
             
             events = []
             for row in result.data:
-                events.append({
+                event = {
                     "event_id": row["event_id"],
                     "event_type": row["event_type"],
                     "timestamp": row["timestamp"],
-                    "person_embedding": json.loads(row["person_embedding"]) if row.get("person_embedding") else None,
                     "person_bbox": json.loads(row["person_bbox"]) if row.get("person_bbox") else None,
                     "cycle_bbox": json.loads(row["cycle_bbox"]) if row.get("cycle_bbox") else None,
                     "image_path": row.get("image_path"),
                     "match_result": json.loads(row["match_result"]) if row.get("match_result") else None,
                     "alert_sent": row.get("alert_sent", False)
-                })
+                }
+                if include_embeddings:
+                    event["person_embedding"] = decode_embedding(row["person_embedding"]).tolist() if row.get("person_embedding") else None
+                events.append(event)
             return events
         except Exception as e:
             print(f"Error getting all events: {e}")
             return []
 
+
+def create_database_service(backend: Optional[str] = None):
+    """
+    Build the event store configured in settings
+    
+    Args:
+        backend: 'supabase' or 'sqlite', defaults to settings.database_backend
+    
+    Falls back to SQLite when Supabase is selected but not installed or
+    configured, so events are never silently dropped.
+    """
+    backend = (backend or settings.database_backend).lower()
+    
+    if backend == "sqlite":
+        return SQLiteDatabaseService()
+    if backend != "supabase":
+        print(f"⚠️  Unknown database backend '{backend}'. Falling back to SQLite.")
+        return SQLiteDatabaseService()
+    
+    if not SUPABASE_AVAILABLE or not (settings.supabase_url and settings.supabase_key):
+        print("⚠️  Supabase not available. Falling back to the SQLite backend.")
+        return SQLiteDatabaseService()
+    return DatabaseService()
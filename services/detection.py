@@ -1,71 +1,141 @@
+import threading
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from typing import List, Optional, Tuple
 from config import settings
+from utils.metrics import timed
 
 
 class DetectionService:
-    """Service for object detection using YOLOv8"""
+    """
+    Service for object detection using YOLOv8
+    
+    ultralytics is imported and the weights are loaded on first use (or by
+    an explicit load() during warm-up), so constructing the service is cheap.
+    """
     
     def __init__(self):
-        self.model = YOLO(settings.yolo_model_path)
+        self._model = None
+        self._load_lock = threading.Lock()
         # COCO class IDs: 0 = person, 2 = car, 3 = motorcycle, 4 = airplane, 5 = bus
         # For cycles/scooters, we'll use bicycle (class 1) or motorcycle (class 3)
         self.person_class_id = 0
         self.cycle_class_ids = [1, 2, 3]  # bicycle, car, motorcycle (covers escooters as motorcycle-like)
     
-    def detect_objects(self, image: np.ndarray) -> dict:
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+    
+    @property
+    def model(self):
+        """The YOLO model, loaded on first access"""
+        if self._model is None:
+            self.load()
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+    
+    def load(self):
+        """Import ultralytics and load the YOLO weights (idempotent, thread-safe)"""
+        with self._load_lock:
+            if self._model is not None:
+                return
+            from ultralytics import YOLO
+            self._model = YOLO(settings.yolo_model_path)
+            print(f"✅ Loaded detection model: {settings.yolo_model_path}")
+    
+    @timed("yolo.detect")
+    def detect(self, image: np.ndarray) -> dict:
         """
-        Detect person and cycle/escooter in image
-        
+        Run a single YOLO pass and return everything the pipeline needs
+
         Returns:
-            dict with 'person' and 'cycle' keys containing bbox lists
+            dict with 'person' and 'cycle' bboxes, their confidences
+            ('person_confidence', 'cycle_confidence') and the cropped
+            person image ('person_crop'), or None for anything not found
         """
         results = self.model(image, verbose=False)
+        boxes = results[0].boxes if len(results) > 0 else None
+        return self._postprocess(image, boxes)
+    
+    @timed("yolo.detect_batch")
+    def detect_batch(self, images: List[np.ndarray]) -> List[dict]:
+        """
+        Run one batched YOLO pass over several images
+        
+        Returns:
+            One detect()-style dict per image, in the same order
+        """
+        if len(images) == 0:
+            return []
+        
+        results = self.model(list(images), verbose=False)
+        return [self._postprocess(image, result.boxes) for image, result in zip(images, results)]
+    
+    def _postprocess(self, image: np.ndarray, boxes) -> dict:
+        """Reduce YOLO boxes to the best person/cycle detections for image"""
         detections = {
             'person': None,
-            'cycle': None
+            'cycle': None,
+            'person_confidence': None,
+            'cycle_confidence': None,
+            'person_crop': None
         }
         
-        if len(results) == 0:
-            return detections
-        
-        result = results[0]
-        boxes = result.boxes
-        
         if boxes is None or len(boxes) == 0:
             return detections
         
-        # Find person with highest confidence
-        person_conf = 0
-        person_box = None
-        
-        # Find cycle with highest confidence
-        cycle_conf = 0
-        cycle_box = None
-        
-        for box in boxes:
-            cls = int(box.cls[0])
-            conf = float(box.conf[0])
-            xyxy = box.xyxy[0].cpu().numpy().tolist()
-            
-            if cls == self.person_class_id and conf > person_conf:
-                person_conf = conf
-                person_box = xyxy
-            
-            if cls in self.cycle_class_ids and conf > cycle_conf:
-                cycle_conf = conf
-                cycle_box = xyxy
+        # Single device-to-host transfer for all boxes: [x1, y1, x2, y2, (track_id,) conf, cls]
+        data = boxes.data.cpu().numpy()
+        xyxy = data[:, :4]
+        confs = data[:, -2]
+        classes = data[:, -1].astype(np.int64)
+        
+        # Highest-confidence person and cycle/escooter
+        person_box, person_conf = self._best_box(xyxy, confs, classes == self.person_class_id)
+        cycle_box, cycle_conf = self._best_box(xyxy, confs, np.isin(classes, self.cycle_class_ids))
         
         if person_box:
             detections['person'] = person_box
+            detections['person_confidence'] = person_conf
+            detections['person_crop'] = self.crop_person(image, person_box)
         
         if cycle_box:
             detections['cycle'] = cycle_box
+            detections['cycle_confidence'] = cycle_conf
         
         return detections
     
+    @staticmethod
+    def _best_box(xyxy: np.ndarray, confs: np.ndarray, mask: np.ndarray) -> Tuple[Optional[List[float]], Optional[float]]:
+        """
+        Pick the highest-confidence box among the rows selected by mask
+        
+        Returns:
+            (bbox, confidence) or (None, None) if no row is selected
+        """
+        if not mask.any():
+            return None, None
+        
+        masked_confs = np.where(mask, confs, -np.inf)
+        best = int(np.argmax(masked_confs))
+        return xyxy[best].tolist(), float(confs[best])
+    
+    def detect_objects(self, image: np.ndarray) -> dict:
+        """
+        Detect person and cycle/escooter in image
+        
+        Returns:
+            dict with 'person' and 'cycle' keys containing bbox lists
+        """
+        detections = self.detect(image)
+        return {
+            'person': detections['person'],
+            'cycle': detections['cycle']
+        }
+    
     def detect_and_crop_person(self, image: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[List[float]]]:
         """
         Detect person in image and return cropped person image and bbox
@@ -73,12 +143,20 @@ class DetectionService:
         Returns:
             (cropped_person_image, bbox) or (None, None) if not found
         """
-        detections = self.detect_objects(image)
+        detections = self.detect(image)
         
-        if detections['person'] is None:
+        if detections['person_crop'] is None:
             return None, None
         
-        bbox = detections['person']
+        return detections['person_crop'], detections['person']
+    
+    def crop_person(self, image: np.ndarray, bbox: List[float]) -> Optional[np.ndarray]:
+        """
+        Crop a person bbox out of image, clamped to the image bounds
+        
+        Returns:
+            Cropped person image or None if the bbox is degenerate
+        """
         x1, y1, x2, y2 = map(int, bbox)
         
         # Crop person from image
@@ -89,8 +167,6 @@ class DetectionService:
         y2 = max(0, min(y2, h))
         
         if x2 <= x1 or y2 <= y1:
-            return None, None
+            return None
         
-        person_crop = image[y1:y2, x1:x2]
-        return person_crop, bbox
-
+        return image[y1:y2, x1:x2]
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from config import settings
+from utils.concurrency import run_io
+from utils.embeddings import encode_embedding, decode_embedding
+
+
+class EventWriter:
+    """
+    Write-behind buffer for new events
+
+    submit() assigns the event id and timestamp, appends the event to a local
+    journal (fsync'd) and returns straight away. A background task flushes
+    buffered events to the database in batches with one insert call each, and
+    retries failed batches. Events still in the journal when the process stops
+    are replayed on the next start, and inserts are idempotent on event_id, so
+    an event is never lost or stored twice.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        journal_path: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[float] = None,
+        retry_seconds: float = 1.0
+    ):
+        self.db_service = db_service
+        self.journal_path = journal_path or settings.event_journal_path
+        self.max_batch_size = max_batch_size or settings.event_batch_size
+        self.flush_interval = (flush_interval_ms if flush_interval_ms is not None else settings.event_flush_interval_ms) / 1000
+        self.retry_seconds = retry_seconds
+        self.batches_written = 0
+        self.events_written = 0
+        # False while the database is rejecting batches
+        self.last_flush_ok = True
+        self._pending: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # Journal records written vs. stored in the database since the last truncation
+        self._journal_lock = threading.Lock()
+        self._journaled = 0
+        self._stored = 0
+
+    def qsize(self) -> int:
+        """Events journaled but not yet written to the database"""
+        return len(self._pending)
+
+    async def start(self):
+        """Replay events journaled by a previous run, then start the flush task"""
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        replayed = await run_io(self._load_journal)
+        if replayed:
+            self._journaled = len(replayed)
+            self._pending.extend(replayed)
+            print(f"📝 Replaying {len(replayed)} journaled events")
+            await self.flush()
+
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the flush task and write out everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def submit(self, event: dict) -> str:
+        """
+        Journal a fully assembled event and queue it for writing
+
+        Returns:
+            The new event_id (the row reaches the database within flush_interval_ms)
+        """
+        event = {
+            **event,
+            "event_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await run_io(self._append_journal, event)
+
+        self._pending.append(event)
+        if len(self._pending) >= self.max_batch_size:
+            self._wakeup.set()
+        return event["event_id"]
+
+    async def flush(self) -> bool:
+        """
+        Write every buffered event now (e.g. before reading events back)
+
+        Returns:
+            True if nothing is left buffered
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch_size]
+                if not await run_io(self.db_service.insert_events, batch):
+                    self.last_flush_ok = False
+                    return False
+                self.last_flush_ok = True
+
+                del self._pending[:len(batch)]
+                self._stored += len(batch)
+                self.batches_written += 1
+                self.events_written += len(batch)
+
+            # Everything in the journal is stored now
+            await run_io(self._truncate_journal)
+            return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self._pending and not await self.flush():
+                # Database unavailable; the events stay journaled and buffered
+                await asyncio.sleep(self.retry_seconds)
+
+    def _append_journal(self, event: dict):
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        record = {**event, "person_embedding": encode_embedding(event["person_embedding"])}
+        with self._journal_lock:
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journaled += 1
+
+    def _truncate_journal(self):
+        # Events journaled during the flush are not stored yet, so only
+        # truncate once every journal record has reached the database
+        with self._journal_lock:
+            if self._journaled != self._stored:
+                return
+            if os.path.exists(self.journal_path):
+                open(self.journal_path, 'w').close()
+            self._journaled = 0
+            self._stored = 0
+
+    def _load_journal(self) -> List[dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+
+        events = []
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    continue
+                event["person_embedding"] = decode_embedding(event["person_embedding"])
+                events.append(event)
+        return events
@@ -1,31 +1,55 @@
-import torch
+import threading
 import numpy as np
 from typing import List, Optional
 import cv2
 from config import settings
-
-# Try to import torchreid, but continue without it if not available
-try:
-    from torchreid import models as torchreid_models
-    TORCHREID_AVAILABLE = True
-except ImportError:
-    TORCHREID_AVAILABLE = False
-    torchreid_models = None
-    print("⚠️  torchreid not installed. Using fallback feature extraction.")
+from utils.metrics import timed
 
 
 class ReIDService:
-    """Service for person re-identification using torchreid"""
+    """
+    Service for person re-identification using torchreid
+    
+    torch/torchreid are imported and the model is built on first use (or by
+    an explicit load() during warm-up), so constructing the service is cheap.
+    """
     
     def __init__(self):
         self.model = None
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self._load_model()
+        self.device = None
+        # Model input size as cv2 (width, height)
+        self.input_size = (256, 128)
+        self.mean = None
+        self.std = None
+        self.is_loaded = False
+        self._load_lock = threading.Lock()
+    
+    @property
+    def mode(self) -> str:
+        """'torchreid', 'fallback' (histogram features) or 'not_loaded'"""
+        if not self.is_loaded:
+            return "not_loaded"
+        return "torchreid" if self.model is not None else "fallback"
+    
+    def load(self):
+        """Import torch, build the ReID model and move it to the device (idempotent, thread-safe)"""
+        with self._load_lock:
+            if self.is_loaded:
+                return
+            import torch
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            # ImageNet normalization stats, built once and kept on the device
+            self.mean = torch.tensor([0.485, 0.456, 0.406], device=self.device).view(1, 3, 1, 1)
+            self.std = torch.tensor([0.229, 0.224, 0.225], device=self.device).view(1, 3, 1, 1)
+            self._load_model()
+            self.is_loaded = True
     
     def _load_model(self):
         """Load torchreid model"""
-        if not TORCHREID_AVAILABLE:
-            print("⚠️  torchreid not available. Using fallback feature extraction.")
+        try:
+            from torchreid import models as torchreid_models
+        except ImportError:
+            print("⚠️  torchreid not installed. Using fallback feature extraction.")
             self.model = None
             return
             
@@ -56,29 +80,44 @@ class ReIDService:
         Returns:
             Normalized embedding vector
         """
+        return self.extract_embeddings([person_image])[0]
+    
+    @timed("reid.extract_embeddings")
+    def extract_embeddings(self, person_images: List[np.ndarray]) -> np.ndarray:
+        """
+        Extract embeddings for a batch of person crops with a single model call
+        
+        Args:
+            person_images: List of BGR image arrays (crops may differ in size)
+        
+        Returns:
+            (N, D) float32 matrix of normalized embeddings, one row per crop
+        """
+        if len(person_images) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        
+        self.load()
         if self.model is None:
             # Fallback: simple feature extraction using histogram and HOG-like features
-            return self._simple_feature_extraction(person_image)
+            return self._simple_feature_extractions(person_images)
         
         try:
-            # Preprocess image
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(person_image, cv2.COLOR_BGR2RGB)
+            import torch
             
+            # Preprocess all crops into one preallocated uint8 batch (NHWC, RGB)
             # Resize to model input size (typically 256x128 for person re-id)
-            resized = cv2.resize(rgb_image, (256, 128))
+            width, height = self.input_size
+            batch = np.empty((len(person_images), height, width, 3), dtype=np.uint8)
+            for i, person_image in enumerate(person_images):
+                rgb_image = cv2.cvtColor(person_image, cv2.COLOR_BGR2RGB)
+                batch[i] = cv2.resize(rgb_image, self.input_size)
             
-            # Normalize and convert to tensor
-            image_tensor = torch.from_numpy(resized).float()
-            image_tensor = image_tensor.permute(2, 0, 1)  # HWC to CHW
-            image_tensor = image_tensor / 255.0
-            image_tensor = image_tensor.unsqueeze(0)  # Add batch dimension
-            image_tensor = image_tensor.to(self.device)
+            # Move uint8 to the device, then convert to normalized float NCHW there
+            image_tensor = torch.from_numpy(batch).to(self.device)
+            image_tensor = image_tensor.permute(0, 3, 1, 2).float().div_(255.0)
             
             # Normalize with ImageNet stats
-            mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1).to(self.device)
-            std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1).to(self.device)
-            image_tensor = (image_tensor - mean) / std
+            image_tensor = image_tensor.sub_(self.mean).div_(self.std)
             
             # Extract features
             with torch.no_grad():
@@ -93,16 +132,20 @@ class ReIDService:
                     # Flatten if needed (shouldn't happen with torchreid models)
                     features = features.view(features.size(0), -1)
                 
-                # Extract first (and only) item from batch: [feature_dim]
-                embedding = features.cpu().numpy()[0]
+                embeddings = features.float().cpu().numpy()
             
-            # Normalize embedding
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-            return embedding
+            # Normalize each embedding
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / (norms + 1e-8)
+            return embeddings.astype(np.float32, copy=False)
             
         except Exception as e:
-            print(f"Error extracting embedding with model: {e}")
-            return self._simple_feature_extraction(person_image)
+            print(f"Error extracting embeddings with model: {e}")
+            return self._simple_feature_extractions(person_images)
+    
+    def _simple_feature_extractions(self, person_images: List[np.ndarray]) -> np.ndarray:
+        """Fallback feature extraction for a batch of crops"""
+        return np.stack([self._simple_feature_extraction(image) for image in person_images]).astype(np.float32)
     
     def _simple_feature_extraction(self, person_image: np.ndarray) -> np.ndarray:
         """Fallback feature extraction using color histograms and texture"""
@@ -141,6 +184,21 @@ class ReIDService:
             # Return a random embedding as last resort
             return np.random.randn(512).astype(np.float32)
     
+    def aggregate_embeddings(self, embeddings: np.ndarray, weights: Optional[List[float]] = None) -> np.ndarray:
+        """
+        Fuse several embeddings of the same person (e.g. from video frames) into one
+        
+        Args:
+            embeddings: (N, D) matrix of normalized embeddings
+            weights: Optional per-row weights (e.g. detection confidence)
+        
+        Returns:
+            Normalized (D,) float32 embedding
+        """
+        embedding = np.average(embeddings, axis=0, weights=weights)
+        embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
+        return embedding.astype(np.float32)
+    
     def compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Compute cosine similarity between two embeddings
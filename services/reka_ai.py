@@ -1,9 +1,17 @@
 from typing import Optional, List
+import asyncio
+import re
 import requests
+import httpx
 import base64
+import hashlib
 import cv2
 import numpy as np
 from config import settings
+from utils.cache import LRUCache
+from utils.metrics import span
+
+DEFAULT_PROMPT = "Are these two images showing the same person? Consider clothing, body type, posture, and accessories. Respond with 'yes' or 'no' and a confidence score (0-1)."
 
 
 class RekaAIService:
@@ -11,8 +19,16 @@ class RekaAIService:
     
     def __init__(self):
         self.api_key = settings.reka_api_key
-        self.api_url = "https://api.reka.ai/v1/chat"  # Update with actual Reka AI API endpoint
+        self.api_url = settings.reka_api_url
         self.is_available = bool(self.api_key and self.api_key != "your_reka_api_key")
+        # Pooled async client and concurrency limit, created on first use inside the event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Verdicts for crop pairs already analyzed, keyed by content hash
+        self.verdict_cache = LRUCache(
+            max_size=settings.reka_cache_size,
+            ttl_seconds=settings.reka_cache_ttl_seconds
+        )
         
         if not self.is_available:
             print("ℹ️  Reka AI is not configured. Continuing without Reka AI (will use torchreid only).")
@@ -25,7 +41,7 @@ class RekaAIService:
         self,
         person_image1: bytes,
         person_image2: bytes,
-        prompt: str = "Are these two images showing the same person? Consider clothing, body type, posture, and accessories. Respond with 'yes' or 'no' and a confidence score (0-1)."
+        prompt: str = DEFAULT_PROMPT
     ) -> Optional[dict]:
         """
         Use Reka AI to analyze if two person images are the same person
@@ -42,82 +58,171 @@ class RekaAIService:
             # Silently return None if not configured (already logged during initialization)
             return None
         
+        cache_key = self._cache_key(person_image1, person_image2, prompt)
+        cached = self.verdict_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Encode images to base64
-            img1_b64 = base64.b64encode(person_image1).decode('utf-8')
-            img2_b64 = base64.b64encode(person_image2).decode('utf-8')
-            
-            # Prepare request
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": "reka-core",  # Update with actual model name
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{img1_b64}"
-                                }
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{img2_b64}"
-                                }
-                            }
-                        ]
-                    }
-                ]
-            }
-            
             # Make API request
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # Parse response (adjust based on actual Reka AI response format)
-                answer = result.get("choices", [{}])[0].get("message", {}).get("content", "").lower()
-                
-                # Simple parsing (adjust based on actual response format)
-                is_same = "yes" in answer or "same" in answer
-                confidence = 0.8  # Default confidence, parse from response if available
-                
-                # Try to extract confidence score from response
-                import re
-                conf_match = re.search(r'confidence[:\s]+([0-9.]+)', answer)
-                if conf_match:
-                    confidence = float(conf_match.group(1))
-                
-                return {
-                    "is_same_person": is_same,
-                    "confidence": confidence,
-                    "raw_response": answer
-                }
-            else:
-                print(f"Reka AI API error: {response.status_code} - {response.text}")
-                return None
+            with span("reka.request"):
+                response = requests.post(
+                    self.api_url,
+                    headers=self._headers(),
+                    json=self._build_payload(person_image1, person_image2, prompt),
+                    timeout=30
+                )
+            return self._remember(cache_key, self._parse_response(response))
                 
         except Exception as e:
             print(f"Error calling Reka AI: {e}")
             return None
     
+    async def analyze_person_similarity_async(
+        self,
+        person_image1: bytes,
+        person_image2: bytes,
+        prompt: str = DEFAULT_PROMPT,
+        budget_seconds: Optional[float] = None
+    ) -> Optional[dict]:
+        """
+        Async version of analyze_person_similarity using a pooled HTTP client
+        
+        At most reka_max_concurrency calls are in flight at once. If the whole
+        call (including waiting for a slot) takes longer than budget_seconds
+        (default: reka_timeout_seconds), None is returned so the caller keeps
+        the torchreid verdict.
+        """
+        if not self.is_available:
+            return None
+        
+        cache_key = self._cache_key(person_image1, person_image2, prompt)
+        cached = self.verdict_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        budget = budget_seconds if budget_seconds is not None else settings.reka_timeout_seconds
+        
+        try:
+            result = await asyncio.wait_for(
+                self._request_async(person_image1, person_image2, prompt),
+                timeout=budget
+            )
+            return self._remember(cache_key, result)
+        except asyncio.TimeoutError:
+            print(f"Reka AI did not answer within {budget:.1f}s, using torchreid result")
+            return None
+        except Exception as e:
+            print(f"Error calling Reka AI: {e}")
+            return None
+    
+    def cache_stats(self) -> dict:
+        """Verdict cache size and hit/miss counters"""
+        return self.verdict_cache.stats()
+    
+    async def close(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _request_async(self, person_image1: bytes, person_image2: bytes, prompt: str) -> Optional[dict]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.reka_max_concurrency,
+                    max_keepalive_connections=settings.reka_max_concurrency
+                ),
+                timeout=httpx.Timeout(settings.reka_timeout_seconds)
+            )
+            self._semaphore = asyncio.Semaphore(settings.reka_max_concurrency)
+        
+        payload = self._build_payload(person_image1, person_image2, prompt)
+        async with self._semaphore:
+            with span("reka.request"):
+                response = await self._client.post(self.api_url, headers=self._headers(), json=payload)
+        return self._parse_response(response)
+    
+    @staticmethod
+    def _cache_key(person_image1: bytes, person_image2: bytes, prompt: str) -> tuple:
+        """Order-independent key for a crop pair: the comparison is symmetric"""
+        digests = sorted((
+            hashlib.sha256(person_image1).hexdigest(),
+            hashlib.sha256(person_image2).hexdigest()
+        ))
+        return (digests[0], digests[1], hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+    
+    def _remember(self, cache_key: tuple, result: Optional[dict]) -> Optional[dict]:
+        """Cache successful verdicts only, so transient API errors are retried"""
+        if result is not None:
+            self.verdict_cache.put(cache_key, result)
+        return result
+    
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _build_payload(self, person_image1: bytes, person_image2: bytes, prompt: str) -> dict:
+        """Chat request with the prompt and both images inlined as base64 JPEG"""
+        # Encode images to base64
+        img1_b64 = base64.b64encode(person_image1).decode('utf-8')
+        img2_b64 = base64.b64encode(person_image2).decode('utf-8')
+        
+        return {
+            "model": "reka-core",  # Update with actual model name
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{img1_b64}"
+                            }
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{img2_b64}"
+                            }
+                        }
+                    ]
+                }
+            ]
+        }
+    
+    def _parse_response(self, response) -> Optional[dict]:
+        """Turn a Reka AI chat response (requests or httpx) into a verdict dict, None on API error"""
+        if response.status_code != 200:
+            print(f"Reka AI API error: {response.status_code} - {response.text}")
+            return None
+        
+        result = response.json()
+        # Parse response (adjust based on actual Reka AI response format)
+        answer = result.get("choices", [{}])[0].get("message", {}).get("content", "").lower()
+        
+        # Simple parsing (adjust based on actual response format)
+        is_same = "yes" in answer or "same" in answer
+        confidence = 0.8  # Default confidence, parse from response if available
+        
+        # Try to extract confidence score from response
+        conf_match = re.search(r'confidence[:\s]+([0-9.]+)', answer)
+        if conf_match:
+            confidence = float(conf_match.group(1))
+        
+        return {
+            "is_same_person": is_same,
+            "confidence": confidence,
+            "raw_response": answer
+        }
+    
     def image_to_bytes(self, image: np.ndarray) -> bytes:
         """Convert numpy image array to bytes"""
         _, buffer = cv2.imencode('.jpg', image)
         return buffer.tobytes()
-
@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from models.event import EventType, MatchResult
+from config import settings
+from utils.embeddings import embedding_to_bytes, embedding_from_bytes
+from utils.metrics import timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT UNIQUE NOT NULL,
+    event_type TEXT NOT NULL CHECK (event_type IN ('dropoff', 'pickup')),
+    timestamp TEXT NOT NULL,
+    -- Raw little-endian float32/float16 bytes; embedding_dtype is the 'f4'/'f2' prefix
+    person_embedding BLOB NOT NULL,
+    embedding_dtype TEXT NOT NULL,
+    person_bbox TEXT NOT NULL,
+    cycle_bbox TEXT,
+    image_path TEXT,
+    match_result TEXT,
+    -- Copied out of match_result so open dropoffs can be found with an index
+    matched_event_id TEXT,
+    is_same_person INTEGER,
+    alert_sent INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events(event_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_events_matched_event_id ON events(matched_event_id) WHERE is_same_person = 1;
+"""
+
+
+class SQLiteDatabaseService:
+    """
+    Embedded event store using SQLite, with the same interface as DatabaseService
+
+    The database runs in WAL mode so readers never block the writer, and
+    embeddings are stored as BLOBs. Each thread of the I/O pool gets its own
+    connection.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.sqlite_path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        self._connection().executescript(SCHEMA)
+        print(f"✅ SQLite database initialized at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection for the calling thread, opened on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints; a power loss can only drop the latest commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def status(self) -> dict:
+        """Backend name and whether the database file answers a query"""
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            connected = True
+        except Exception:
+            connected = False
+        return {"backend": "sqlite", "connected": connected, "path": self.path}
+
+    def create_event(self, event: dict) -> str:
+        """Create a new event in the database"""
+        event_id = str(uuid.uuid4())
+        self.insert_events([{
+            **event,
+            "event_id": event_id,
+            "timestamp": datetime.utcnow().isoformat()
+        }])
+        return event_id
+
+    @timed("db.insert_events")
+    def insert_events(self, events: List[dict]) -> bool:
+        """
+        Insert fully assembled events (event_id and timestamp already set) in one transaction
+
+        Events may carry match_result (a dict) and alert_sent, so a pickup is a
+        single write. Inserts are idempotent on event_id, so a batch can be
+        safely retried.
+
+        Returns:
+            True if the batch was stored
+        """
+        now = datetime.utcnow().isoformat()
+        rows = []
+        for event in events:
+            prefix, embedding = embedding_to_bytes(event["person_embedding"], settings.embedding_storage_dtype)
+            match_result = event.get("match_result")
+            rows.append((
+                event["event_id"],
+                event["event_type"],
+                event["timestamp"],
+                embedding,
+                prefix,
+                json.dumps(event["person_bbox"]),
+                json.dumps(event.get("cycle_bbox")),
+                event.get("image_path"),
+                json.dumps(match_result) if match_result else None,
+                match_result.get("matched_event_id") if match_result else None,
+                int(match_result["is_same_person"]) if match_result else None,
+                int(event.get("alert_sent", False)),
+                now,
+                now
+            ))
+
+        connection = self._connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                """
+                INSERT OR IGNORE INTO events (
+                    event_id, event_type, timestamp, person_embedding, embedding_dtype,
+                    person_bbox, cycle_bbox, image_path, match_result, matched_event_id,
+                    is_same_person, alert_sent, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            connection.execute("COMMIT")
+            return True
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Error creating events: {e}")
+            return False
+
+    @timed("db.get_recent_dropoff_events")
+    def get_recent_dropoff_events(self, limit: int = 10) -> List[dict]:
+        """Get recent dropoff events for comparison"""
+        try:
+            rows = self._connection().execute(
+                """
+                SELECT event_id, person_embedding, embedding_dtype, person_bbox, timestamp
+                FROM events WHERE event_type = ?
+                ORDER BY timestamp DESC LIMIT ?
+                """,
+                (EventType.DROPOFF.value, limit)
+            ).fetchall()
+
+            return [
+                {
+                    "event_id": row["event_id"],
+                    "person_embedding": embedding_from_bytes(row["person_embedding"], row["embedding_dtype"]),
+                    "person_bbox": json.loads(row["person_bbox"]),
+                    "timestamp": row["timestamp"]
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            print(f"Error fetching dropoff events: {e}")
+            return []
+
+    @timed("db.get_open_dropoff_events")
+    def get_open_dropoff_events(self, page_size: int = 1000) -> List[dict]:
+        """
+        Get all dropoff events whose cycle has not been picked up yet
+
+        A dropoff is closed once a pickup event matched it as the same person.
+        page_size is accepted for interface compatibility; rows are streamed.
+
+        Raises:
+            sqlite3.Error if the query fails, so callers can retry instead of
+            matching pickups against an empty gallery
+        """
+        try:
+            rows = self._connection().execute(
+                """
+                SELECT d.event_id, d.person_embedding, d.embedding_dtype, d.timestamp
+                FROM events d
+                WHERE d.event_type = ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM events p
+                      WHERE p.matched_event_id = d.event_id AND p.is_same_person = 1
+                  )
+                ORDER BY d.timestamp DESC
+                """,
+                (EventType.DROPOFF.value,)
+            )
+
+            return [
+                {
+                    "event_id": row["event_id"],
+                    "person_embedding": embedding_from_bytes(row["person_embedding"], row["embedding_dtype"]),
+                    "timestamp": row["timestamp"]
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            print(f"Error fetching open dropoff events: {e}")
+            raise
+
+    @timed("db.update_event_match_result")
+    def update_event_match_result(self, event_id: str, match_result: MatchResult, alert_sent: bool = False):
+        """Update event with match result"""
+        try:
+            self._connection().execute(
+                """
+                UPDATE events
+                SET match_result = ?, matched_event_id = ?, is_same_person = ?, alert_sent = ?, updated_at = ?
+                WHERE event_id = ?
+                """,
+                (
+                    json.dumps({
+                        "is_same_person": match_result.is_same_person,
+                        "similarity_score": match_result.similarity_score,
+                        "confidence": match_result.confidence,
+                        "matched_event_id": match_result.matched_event_id
+                    }),
+                    match_result.matched_event_id,
+                    int(match_result.is_same_person),
+                    int(alert_sent),
+                    datetime.utcnow().isoformat(),
+                    event_id
+                )
+            )
+        except Exception as e:
+            print(f"Error updating event match result: {e}")
+
+    @timed("db.mark_alert_sent")
+    def mark_alert_sent(self, event_id: str):
+        """Record that the security alert for event_id was delivered"""
+        try:
+            self._connection().execute(
+                "UPDATE events SET alert_sent = 1, updated_at = ? WHERE event_id = ?",
+                (datetime.utcnow().isoformat(), event_id)
+            )
+        except Exception as e:
+            print(f"Error marking alert sent: {e}")
+
+    @timed("db.get_event")
+    def get_event(self, event_id: str) -> Optional[dict]:
+        """Get event by ID"""
+        try:
+            row = self._connection().execute(
+                "SELECT * FROM events WHERE event_id = ?",
+                (event_id,)
+            ).fetchone()
+
+            if row is None:
+                return None
+            event = self._row_to_event(row)
+            event["person_embedding"] = embedding_from_bytes(row["person_embedding"], row["embedding_dtype"]).tolist()
+            return event
+        except Exception as e:
+            print(f"Error getting event: {e}")
+            return None
+
+    # Columns returned by event listings; person_embedding is only fetched on request
+    SUMMARY_COLUMNS = "event_id, event_type, timestamp, person_bbox, cycle_bbox, image_path, match_result, alert_sent"
+
+    @timed("db.get_all_events")
+    def get_all_events(self, limit: int = 100, before: Optional[str] = None, include_embeddings: bool = False) -> List[dict]:
+        """
+        Get events newest first with keyset pagination on timestamp
+
+        Args:
+            limit: Maximum number of events to return
+            before: Only return events older than this timestamp (the last
+                timestamp of the previous page)
+            include_embeddings: Also fetch and decode person embeddings
+        """
+        try:
+            columns = self.SUMMARY_COLUMNS + ", person_embedding, embedding_dtype" if include_embeddings else self.SUMMARY_COLUMNS
+            query = f"SELECT {columns} FROM events"
+            params = []
+            if before:
+                query += " WHERE timestamp < ?"
+                params.append(before)
+            query += " ORDER BY timestamp DESC LIMIT ?"
+            params.append(limit)
+
+            events = []
+            for row in self._connection().execute(query, params):
+                event = self._row_to_event(row)
+                if include_embeddings:
+                    event["person_embedding"] = embedding_from_bytes(row["person_embedding"], row["embedding_dtype"]).tolist()
+                events.append(event)
+            return events
+        except Exception as e:
+            print(f"Error getting all events: {e}")
+            return []
+
+    @staticmethod
+    def _row_to_event(row: sqlite3.Row) -> dict:
+        return {
+            "event_id": row["event_id"],
+            "event_type": row["event_type"],
+            "timestamp": row["timestamp"],
+            "person_bbox": json.loads(row["person_bbox"]) if row["person_bbox"] else None,
+            "cycle_bbox": json.loads(row["cycle_bbox"]) if row["cycle_bbox"] else None,
+            "image_path": row["image_path"],
+            "match_result": json.loads(row["match_result"]) if row["match_result"] else None,
+            "alert_sent": bool(row["alert_sent"])
+        }
@@ -0,0 +1,321 @@
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import settings
+
+
+class EmbeddingIndex:
+    """
+    Resident in-memory index of dropoff embeddings for pickup matching
+    
+    This is the exact (brute-force) matcher and the interface every backend
+    implements: add/add_many/remove/search. Approximate backends override the
+    _after_add/_after_move/_candidates hooks.
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 1024):
+        self.dim = dim
+        self._capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._positions
+
+    def add(self, event_id: str, embedding) -> bool:
+        """
+        Add (or replace) the embedding for event_id
+
+        Returns:
+            True if added, False if the embedding dimension does not match the index
+        """
+        vector = self._normalize(np.asarray(embedding, dtype=np.float32).ravel())
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vector.shape[0]
+            if vector.shape[0] != self.dim:
+                print(f"⚠️  Skipping embedding for {event_id}: dimension {vector.shape[0]} != index dimension {self.dim}")
+                return False
+
+            self._ensure_capacity(len(self._ids) + 1)
+            position = self._positions.get(event_id)
+            if position is None:
+                position = len(self._ids)
+                self._ids.append(event_id)
+                self._positions[event_id] = position
+            self._matrix[position] = vector
+            self._after_add(position)
+            return True
+
+    def add_many(self, event_ids: Sequence[str], embeddings: Sequence) -> int:
+        """Add several embeddings, returning how many were indexed"""
+        added = 0
+        for event_id, embedding in zip(event_ids, embeddings):
+            if self.add(event_id, embedding):
+                added += 1
+        return added
+
+    def remove(self, event_id: str) -> bool:
+        """Remove event_id from the index (e.g. once its cycle has been picked up)"""
+        with self._lock:
+            position = self._positions.pop(event_id, None)
+            if position is None:
+                return False
+
+            # Swap the last row into the freed slot to keep the matrix dense
+            last = len(self._ids) - 1
+            if position != last:
+                last_id = self._ids[last]
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = last_id
+                self._positions[last_id] = position
+                self._after_move(last, position)
+            self._ids.pop()
+            return True
+
+    def search(self, query, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Find the k most similar indexed embeddings with one matrix-vector product
+
+        Returns:
+            List of (event_id, similarity) sorted by similarity, with similarity
+            mapped to [0, 1] the same way as ReIDService.compute_similarity
+        """
+        vector = self._normalize(np.asarray(query, dtype=np.float32).ravel())
+
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or k <= 0 or vector.shape[0] != self.dim:
+                return []
+
+            # Cosine similarity against every candidate embedding
+            candidates = self._candidates(vector, count, k)
+            if candidates is None:
+                candidates = np.arange(count)
+                scores = self._matrix[:count] @ vector
+            else:
+                scores = self._matrix[candidates] @ vector
+
+            k = min(k, len(candidates))
+            if k < len(candidates):
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-scores[top])]
+
+            return [(self._ids[candidates[i]], float((scores[i] + 1) / 2)) for i in top]
+
+    def _after_add(self, position: int):
+        """Hook called (under the lock) after a row is written at position"""
+
+    def _after_move(self, source: int, destination: int):
+        """Hook called (under the lock) after row source is moved to destination"""
+
+    def _candidates(self, vector: np.ndarray, count: int, k: int) -> Optional[np.ndarray]:
+        """Positions to score for a query, or None to scan every row (exact search)"""
+        return None
+
+    def _ensure_capacity(self, size: int):
+        """Grow the backing matrix geometrically so adds stay amortized O(D)"""
+        if self._matrix is None:
+            self._capacity = max(self._capacity, size)
+            self._matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+            return
+
+        if size <= self._matrix.shape[0]:
+            return
+
+        new_capacity = max(size, self._matrix.shape[0] * 2)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = matrix
+        self._capacity = new_capacity
+        self._after_grow(new_capacity)
+
+    def _after_grow(self, capacity: int):
+        """Hook called (under the lock) after the backing matrix grows"""
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        return vector / (np.linalg.norm(vector) + 1e-8)
+
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Approximate matcher using an inverted-file (IVF) index
+    
+    Embeddings are clustered with spherical k-means into nlist cells and a
+    query only scores the rows in its nprobe closest cells. Until enough
+    embeddings exist to train the quantizer (or when the probed cells hold
+    fewer than k rows) it falls back to exact search.
+
+    Training runs on a background thread and the new quantizer is swapped in
+    when it is ready, so add() never waits for k-means; queries keep using
+    the previous quantizer (or exact search) meanwhile.
+    """
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        nlist: int = 256,
+        nprobe: int = 16,
+        min_train_size: Optional[int] = None,
+        kmeans_iterations: int = 10,
+        initial_capacity: int = 1024,
+        seed: int = 0
+    ):
+        super().__init__(dim=dim, initial_capacity=initial_capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # Roughly 40 points per cell keeps k-means centroids stable
+        self.min_train_size = min_train_size if min_train_size is not None else nlist * 39
+        self.kmeans_iterations = kmeans_iterations
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(initial_capacity, dtype=np.int32)
+        self._trained_size = 0
+        self._defer_training = False
+        self._training: Optional[threading.Thread] = None
+        # Ids written or moved while a background training run is in progress
+        self._changed: Optional[set] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def wait_until_trained(self, timeout: Optional[float] = None):
+        """Block until a background training run in progress (if any) has been swapped in"""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    def add_many(self, event_ids: Sequence[str], embeddings: Sequence) -> int:
+        """Add several embeddings, starting at most one training run at the end"""
+        self._defer_training = True
+        try:
+            added = super().add_many(event_ids, embeddings)
+        finally:
+            self._defer_training = False
+
+        with self._lock:
+            self._maybe_start_training()
+        return added
+
+    def _after_add(self, position: int):
+        if self._centroids is not None:
+            self._assignments[position] = int(np.argmax(self._centroids @ self._matrix[position]))
+        if self._changed is not None:
+            self._changed.add(self._ids[position])
+        if not self._defer_training:
+            self._maybe_start_training()
+
+    def _after_move(self, source: int, destination: int):
+        self._assignments[destination] = self._assignments[source]
+        if self._changed is not None:
+            self._changed.add(self._ids[destination])
+
+    def _maybe_start_training(self):
+        """Train once there is enough data, then retrain each time the index doubles (under the lock)"""
+        count = len(self._ids)
+        if self._training is not None or count < self.min_train_size or count < 2 * self._trained_size:
+            return
+
+        # The thread reads rows from this matrix without the lock. Rows are only
+        # rewritten by add/move, which record their id in _changed, and those
+        # are reassigned under the lock when the new quantizer is swapped in.
+        self._trained_size = count
+        self._changed = set()
+        self._training = threading.Thread(
+            target=self._train,
+            args=(self._matrix, count),
+            name="ivf-train",
+            daemon=True
+        )
+        self._training.start()
+
+    def _after_grow(self, capacity: int):
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[:len(self._assignments)] = self._assignments
+        self._assignments = assignments
+
+    def _candidates(self, vector: np.ndarray, count: int, k: int) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+
+        nprobe = min(self.nprobe, len(self._centroids))
+        centroid_scores = self._centroids @ vector
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.flatnonzero(np.isin(self._assignments[:count], probes))
+
+        if len(candidates) < k:
+            return None
+        return candidates
+
+    def _train(self, matrix: np.ndarray, count: int):
+        """Fit a new quantizer on a background thread, then swap it in"""
+        try:
+            centroids = self._fit_centroids(matrix[:count])
+            assignments = np.argmax(matrix[:count] @ centroids.T, axis=1).astype(np.int32)
+
+            with self._lock:
+                capacity = max(self._matrix.shape[0], count)
+                swapped = np.zeros(capacity, dtype=np.int32)
+                swapped[:count] = assignments
+                # Rows written since the snapshot get assigned from their current contents
+                positions = [self._positions[event_id] for event_id in self._changed if event_id in self._positions]
+                if positions:
+                    swapped[positions] = np.argmax(self._matrix[positions] @ centroids.T, axis=1)
+                self._centroids = centroids
+                self._assignments = swapped
+        except Exception as e:
+            print(f"⚠️  IVF training failed: {e}")
+        finally:
+            with self._lock:
+                self._changed = None
+                self._training = None
+
+    def _fit_centroids(self, data: np.ndarray) -> np.ndarray:
+        """Spherical k-means on a bounded sample of data"""
+        count = len(data)
+        nlist = min(self.nlist, count)
+
+        # Train on a bounded sample so retraining cost does not grow with the index
+        sample_size = min(count, nlist * 64)
+        sample = data[self._rng.choice(count, sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            one_hot = np.zeros((sample_size, nlist), dtype=np.float32)
+            one_hot[np.arange(sample_size), labels] = 1.0
+            sums = one_hot.T @ sample
+            empty = one_hot.sum(axis=0) == 0
+            # Re-seed empty cells with random sample points
+            sums[empty] = sample[self._rng.choice(sample_size, int(empty.sum()))]
+            centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+
+        return centroids.astype(np.float32)
+
+
+def create_embedding_index(backend: Optional[str] = None) -> EmbeddingIndex:
+    """
+    Build the pickup matcher configured in settings
+    
+    Args:
+        backend: 'exact' (brute force) or 'ivf' (approximate), defaults to settings.matcher_backend
+    """
+    backend = (backend or settings.matcher_backend).lower()
+
+    if backend == "exact":
+        return EmbeddingIndex()
+    if backend == "ivf":
+        return IVFIndex(nlist=settings.ivf_nlist, nprobe=settings.ivf_nprobe)
+
+    print(f"⚠️  Unknown matcher backend '{backend}'. Falling back to exact search.")
+    return EmbeddingIndex()
@@ -0,0 +1,87 @@
+"""
+/api/health must stay responsive while detections and I/O are in flight
+
+Runs the app in-process against a throwaway SQLite store with the synthetic
+detector from benchmarks/bench_load.py, fills the inference and I/O pools
+with work lasting about a second, and checks that health answers well
+within that time.
+
+    python -m pytest tests/test_health_under_load.py
+"""
+import asyncio
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+# Each blocking job holds a pool worker for this long
+BUSY_SECONDS = 1.0
+# Health has to answer well within BUSY_SECONDS to count as non-blocking
+MAX_HEALTH_SECONDS = 0.25
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp("cycleguard")
+    os.environ.update({
+        "DATABASE_BACKEND": "sqlite",
+        "SQLITE_PATH": str(work_dir / "data" / "cycleguard.db"),
+        "EVENT_JOURNAL_PATH": str(work_dir / "data" / "event_journal.jsonl"),
+        "ALERT_SPOOL_DIR": str(work_dir / "alert_spool"),
+        "CROP_DIR": str(work_dir / "uploads" / "crops"),
+        "MODEL_WARMUP": "false",
+        "TIMING_LOGS": "false"
+    })
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        main = importlib.import_module("main")
+        from bench_load import SyntheticDetector
+
+        # Detection holds an inference worker for BUSY_SECONDS per call
+        main.detection_service.model = SyntheticDetector(BUSY_SECONDS * 1000, 0.0)
+        yield main
+    finally:
+        os.chdir(cwd)
+
+
+def test_health_latency_bounded_while_pools_are_busy(api):
+    import httpx
+    from utils.concurrency import run_inference, run_io
+
+    async def scenario():
+        async with api.lifespan(api.app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as client:
+                # Database status is collected in the background at startup
+                for _ in range(100):
+                    if api.database_status["checked_at"] is not None:
+                        break
+                    await asyncio.sleep(0.01)
+
+                frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                busy = [asyncio.ensure_future(run_inference(api.detection_service.detect, frame)) for _ in range(4)]
+                busy += [asyncio.ensure_future(run_io(time.sleep, BUSY_SECONDS)) for _ in range(api.settings.io_workers)]
+                await asyncio.sleep(0.05)
+
+                latencies = []
+                while not all(task.done() for task in busy):
+                    start = time.perf_counter()
+                    response = await client.get("/api/health")
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                    await asyncio.sleep(0.05)
+                await asyncio.gather(*busy)
+                return latencies, response.json()
+
+    latencies, health = asyncio.run(scenario())
+
+    assert len(latencies) >= 5, "pools drained before health was sampled"
+    assert max(latencies) < MAX_HEALTH_SECONDS, f"health took {max(latencies):.3f}s under load"
+    assert health["services"]["database"]["backend"] == "sqlite"
@@ -0,0 +1,94 @@
+"""
+Reka AI client against the local stub: latency budget, concurrency limit, errors
+
+RekaAIService's pooled client is pointed at benchmarks/reka_stub_server.py
+in-process (no network), with the stub's delay and status set per test.
+
+    python -m pytest tests/test_reka_fallback.py
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+import reka_stub_server
+from config import settings
+from services import reka_ai
+from services.reka_ai import RekaAIService
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    state = reka_stub_server.app.state
+    state.delay_ms = 0.0
+    state.answer = "yes, same person. confidence: 0.9"
+    state.status_code = 200
+    state.requests = 0
+    state.in_flight = 0
+    state.peak_in_flight = 0
+
+    # The service builds its own client; route it to the stub app instead of the network
+    client_class = httpx.AsyncClient
+    monkeypatch.setattr(
+        reka_ai.httpx,
+        "AsyncClient",
+        lambda **kwargs: client_class(transport=httpx.ASGITransport(app=reka_stub_server.app), **kwargs)
+    )
+    monkeypatch.setattr(settings, "reka_api_key", "stub")
+    monkeypatch.setattr(settings, "reka_api_url", "http://stub/v1/chat")
+    return state
+
+
+def analyze(service: RekaAIService, count: int) -> list:
+    """Compare `count` distinct crop pairs concurrently"""
+    async def run():
+        try:
+            return await asyncio.gather(*(
+                service.analyze_person_similarity_async(b"crop-a-%d" % i, b"crop-b-%d" % i)
+                for i in range(count)
+            ))
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def test_verdict_parsed_from_stub(stub):
+    results = analyze(RekaAIService(), 1)
+
+    assert results[0]["is_same_person"] is True
+    assert results[0]["confidence"] == pytest.approx(0.9)
+
+
+def test_slower_than_budget_returns_none(stub, monkeypatch):
+    stub.delay_ms = 500.0
+    monkeypatch.setattr(settings, "reka_timeout_seconds", 0.1)
+
+    assert analyze(RekaAIService(), 1) == [None]
+
+
+def test_concurrency_limited_to_reka_max_concurrency(stub, monkeypatch):
+    stub.delay_ms = 100.0
+    monkeypatch.setattr(settings, "reka_max_concurrency", 2)
+
+    results = analyze(RekaAIService(), 6)
+
+    assert all(result is not None for result in results)
+    assert stub.requests == 6
+    assert stub.peak_in_flight == 2
+
+
+def test_error_status_returns_none_and_is_not_cached(stub):
+    stub.status_code = 503
+    service = RekaAIService()
+
+    assert analyze(service, 1) == [None]
+    # Failures are not cached, so the next call reaches the API again
+    assert analyze(service, 1) == [None]
+    assert stub.requests == 2
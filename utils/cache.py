@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters"""
+    
+    def __init__(self, max_size: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key (marking it recently used) or default"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # Expired
+                del self._items[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key: Hashable, value: Any):
+        """Insert or refresh key, evicting the least recently used entries over max_size"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (or default)"""
+        with self._lock:
+            entry = self._items.pop(key, None)
+            return entry[0] if entry is not None else default
+    
+    def stats(self) -> dict:
+        """Size and hit/miss counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
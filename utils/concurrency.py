@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+
+# Model inference (YOLO, torchreid) runs on its own small pool. PyTorch and
+# OpenCV release the GIL, so threads overlap with the event loop, and keeping
+# the pool small bounds how many forward passes compete for the CPU/GPU.
+inference_executor = ThreadPoolExecutor(
+    max_workers=settings.inference_workers,
+    thread_name_prefix="inference"
+)
+
+# Blocking I/O (file decode, Supabase, Telegram, Reka) gets a wider pool
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.io_workers,
+    thread_name_prefix="io"
+)
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a blocking model call on the inference pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. request timings) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(inference_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking I/O call on the I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executors(wait: bool = True):
+    """Stop accepting work and wait for in-flight calls to finish"""
+    inference_executor.shutdown(wait=wait)
+    io_executor.shutdown(wait=wait)
@@ -0,0 +1,71 @@
+import base64
+import json
+import numpy as np
+from typing import Optional, Tuple, Union
+
+# Storage dtype name -> (prefix stored with the data, numpy dtype)
+_STORAGE_DTYPES = {
+    "float32": ("f4", np.float32),
+    "float16": ("f2", np.float16),
+}
+_PREFIX_DTYPES = {prefix: dtype for prefix, dtype in _STORAGE_DTYPES.values()}
+
+
+def encode_embedding(embedding, dtype: str = "float32") -> str:
+    """
+    Encode an embedding as compact base64 text for storage
+    
+    The result looks like "f4:<base64 of little-endian float32 bytes>", so the
+    dtype travels with the data and rows written with different settings can
+    still be decoded.
+    """
+    prefix, data = embedding_to_bytes(embedding, dtype)
+    return f"{prefix}:{base64.b64encode(data).decode('ascii')}"
+
+
+def embedding_to_bytes(embedding, dtype: str = "float32") -> Tuple[str, bytes]:
+    """
+    Pack an embedding as raw little-endian bytes for binary (BLOB) storage
+    
+    Returns:
+        (prefix, data) where prefix ("f4"/"f2") identifies the dtype for embedding_from_bytes
+    """
+    if dtype not in _STORAGE_DTYPES:
+        raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+    
+    prefix, np_dtype = _STORAGE_DTYPES[dtype]
+    array = np.asarray(embedding, dtype=np.dtype(np_dtype).newbyteorder("<")).ravel()
+    return prefix, array.tobytes()
+
+
+def embedding_from_bytes(data: bytes, prefix: str = "f4") -> np.ndarray:
+    """Unpack raw bytes written by embedding_to_bytes into a float32 NumPy array"""
+    if prefix not in _PREFIX_DTYPES:
+        raise ValueError(f"Unknown embedding encoding: {prefix}")
+    
+    np_dtype = np.dtype(_PREFIX_DTYPES[prefix]).newbyteorder("<")
+    return np.frombuffer(data, dtype=np_dtype).astype(np.float32)
+
+
+def decode_embedding(value: Union[str, list, np.ndarray, None]) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding straight into a float32 NumPy array
+    
+    Accepts the binary format written by encode_embedding as well as legacy
+    JSON rows (a JSON text array or an already-parsed list).
+    """
+    if value is None:
+        return None
+    
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    
+    if isinstance(value, list):
+        return np.asarray(value, dtype=np.float32)
+    
+    if value.startswith("["):
+        # Legacy JSON text storage
+        return np.asarray(json.loads(value), dtype=np.float32)
+    
+    prefix, _, payload = value.partition(":")
+    return embedding_from_bytes(base64.b64decode(payload), prefix)
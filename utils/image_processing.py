@@ -1,19 +1,125 @@
 import cv2
 import numpy as np
 from PIL import Image
-from typing import Optional, Tuple
-import aiofiles
+from typing import List, Optional, Tuple
+import hashlib
 import os
+import uuid
+from utils.concurrency import run_io
+from utils.metrics import timed
 
 
-async def save_uploaded_file(file, upload_dir: str = "uploads") -> str:
-    """Save uploaded file to disk"""
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+async def save_uploaded_file(
+    file,
+    upload_dir: str = "uploads",
+    max_bytes: Optional[int] = None,
+    chunk_size: int = 1024 * 1024
+) -> str:
+    """
+    Stream an uploaded file to disk under a content-addressed name
+    
+    The upload is read and written in chunk_size pieces, so memory per request
+    stays constant regardless of file size. The file is named after the
+    SHA-256 of its content (keeping the original extension), so concurrent
+    uploads never overwrite each other and identical uploads are stored once.
+    
+    Raises:
+        UploadTooLargeError: if the upload is larger than max_bytes
+    """
     os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    return file_path
+    temp_path = os.path.join(upload_dir, f".upload-{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    size = 0
+    
+    try:
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds maximum size of {max_bytes} bytes")
+                # Hash and write off the event loop; both release the GIL
+                await run_io(_write_chunk, f, hasher, chunk)
+        
+        file_path = _content_addressed_path(hasher.hexdigest(), file.filename, upload_dir)
+        if os.path.exists(file_path):
+            # Same content already stored
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, file_path)
+        return file_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+async def read_uploaded_bytes(file, max_bytes: Optional[int] = None, chunk_size: int = 1024 * 1024) -> bytearray:
+    """
+    Read an upload into memory in chunks, enforcing max_bytes as it goes
+    
+    Raises:
+        UploadTooLargeError: if the upload is larger than max_bytes
+    """
+    data = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return data
+        data += chunk
+        if max_bytes is not None and len(data) > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds maximum size of {max_bytes} bytes")
+
+
+def upload_path_for(data, filename: Optional[str], upload_dir: str = "uploads") -> str:
+    """Content-addressed path an in-memory upload will be stored under"""
+    return _content_addressed_path(hashlib.sha256(data).hexdigest(), filename, upload_dir)
+
+
+@timed("upload.write")
+def write_upload(file_path: str, data):
+    """Atomically write upload bytes to file_path (no-op if already stored)"""
+    if os.path.exists(file_path):
+        return
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@timed("image.decode")
+def decode_image_bytes(data) -> Optional[np.ndarray]:
+    """Decode an encoded image (JPEG/PNG/...) from memory without copying the bytes"""
+    buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def _content_addressed_path(digest: str, filename: Optional[str], upload_dir: str) -> str:
+    return os.path.join(upload_dir, digest + _upload_extension(filename))
+
+
+def _write_chunk(f, hasher, chunk: bytes):
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _upload_extension(filename: Optional[str]) -> str:
+    """Lower-cased extension of the client filename, if it looks like a real one"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext[1:].isalnum() and len(ext) <= 6 else ""
 
 
 def extract_frame_from_video(video_path: str, frame_index: Optional[int] = None) -> np.ndarray:
@@ -63,6 +169,100 @@ def extract_frame_from_video(video_path: str, frame_index: Optional[int] = None)
     return frame
 
 
+@timed("video.extract_frames")
+def extract_frames_from_video(video_path: str, num_frames: int = 8, mode: str = "uniform") -> List[np.ndarray]:
+    """
+    Sample several frames from a video in a single sequential decode pass
+    
+    Args:
+        video_path: Path to video file
+        num_frames: Number of frames to return
+        mode: 'uniform' (evenly spaced frames) or 'motion' (the frame with the
+            most motion from each of num_frames equal segments)
+    
+    Returns:
+        List of frames (numpy arrays) in video order
+    """
+    cap = cv2.VideoCapture(video_path)
+    
+    if not cap.isOpened():
+        cap.release()
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    if total_frames <= 0:
+        cap.release()
+        raise ValueError(f"Video file has no frames: {video_path}")
+    
+    num_frames = max(1, min(num_frames, total_frames))
+    
+    try:
+        if mode == "motion":
+            frames = _sample_frames_by_motion(cap, total_frames, num_frames)
+        else:
+            frames = _sample_frames_uniform(cap, total_frames, num_frames)
+    finally:
+        cap.release()
+    
+    if not frames:
+        raise ValueError(f"Could not extract frames from video: {video_path}")
+    
+    return frames
+
+
+def _sample_frames_uniform(cap, total_frames: int, num_frames: int) -> List[np.ndarray]:
+    """Evenly spaced frames; skipped frames are grabbed but never converted"""
+    # Centre of each of num_frames equal segments
+    targets = set(((np.arange(num_frames) + 0.5) * total_frames / num_frames).astype(int).tolist())
+    last_target = max(targets)
+    frames = []
+    
+    for index in range(last_target + 1):
+        if not cap.grab():
+            break
+        if index in targets:
+            ret, frame = cap.retrieve()
+            if ret and frame is not None:
+                frames.append(frame)
+    
+    return frames
+
+
+def _sample_frames_by_motion(cap, total_frames: int, num_frames: int) -> List[np.ndarray]:
+    """Per segment, keep the frame that differs most from its predecessor"""
+    segment_length = total_frames / num_frames
+    frames = []
+    best_frame, best_score = None, -1.0
+    previous_small = None
+    segment = 0
+    
+    for index in range(total_frames):
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            break
+        
+        # Segment boundary: keep the winner of the segment that just ended
+        if int(index / segment_length) != segment:
+            if best_frame is not None:
+                frames.append(best_frame)
+            best_frame, best_score = None, -1.0
+            segment = int(index / segment_length)
+        
+        # Motion score on a small grayscale thumbnail to keep this cheap
+        small = cv2.cvtColor(cv2.resize(frame, (64, 36)), cv2.COLOR_BGR2GRAY)
+        score = float(cv2.absdiff(small, previous_small).mean()) if previous_small is not None else 0.0
+        previous_small = small
+        
+        if score > best_score:
+            best_frame, best_score = frame, score
+    
+    if best_frame is not None:
+        frames.append(best_frame)
+    
+    return frames
+
+
 def validate_image(image: np.ndarray) -> bool:
     """Validate that image is not empty and has valid dimensions"""
     if image is None:
@@ -99,6 +299,27 @@ def crop_bbox(image: np.ndarray, bbox: list) -> np.ndarray:
     return crop
 
 
+def encode_jpeg(image: np.ndarray, quality: int = 90) -> bytes:
+    """Encode image as JPEG bytes"""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image as JPEG")
+    return buffer.tobytes()
+
+
+def encode_thumbnail(image: np.ndarray, max_side: int = 480, quality: int = 80) -> bytes:
+    """
+    Downscale image so its longest side is at most max_side and encode as JPEG
+    
+    Used for alert attachments, where a small photo matters more than detail.
+    """
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return encode_jpeg(image, quality=quality)
+
+
 def resize_image(image: np.ndarray, size: Tuple[int, int] = (256, 256)) -> np.ndarray:
     """Resize image to specified size"""
     return cv2.resize(image, size)
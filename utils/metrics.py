@@ -0,0 +1,178 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+from config import settings
+
+# Prometheus histogram bucket upper bounds, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage durations (ms) of the request being handled, set by start_request_timings()
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings",
+    default=None
+)
+
+
+class StageLatencies:
+    """
+    Thread-safe latency statistics per pipeline stage
+
+    Each stage keeps its last window_size samples, so percentiles follow
+    current behaviour instead of being diluted by the whole process lifetime,
+    plus cumulative histogram buckets for Prometheus.
+    """
+
+    def __init__(self, window_size: int = 1024, buckets: tuple = DURATION_BUCKETS):
+        self.window_size = window_size
+        self.buckets = buckets
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._sums: Dict[str, float] = {}
+        self._bucket_counts: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration_ms: float):
+        """Record one duration (milliseconds) for stage"""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window_size)
+                self._counts[stage] = 0
+                self._sums[stage] = 0.0
+                self._bucket_counts[stage] = [0] * len(self.buckets)
+            samples.append(duration_ms)
+            self._counts[stage] += 1
+            self._sums[stage] += duration_ms / 1000
+            # Count in the first bucket that fits; render_prometheus accumulates
+            index = bisect.bisect_left(self.buckets, duration_ms / 1000)
+            if index < len(self.buckets):
+                self._bucket_counts[stage][index] += 1
+
+    def summary(self, stage: Optional[str] = None) -> dict:
+        """
+        Rolling p50/p95/p99 per stage
+
+        Returns:
+            {stage: {"count", "window", "p50_ms", "p95_ms", "p99_ms", "max_ms"}},
+            where count is the lifetime total and window the samples summarized
+        """
+        with self._lock:
+            stages = [stage] if stage is not None else list(self._samples)
+            snapshot = {name: (np.fromiter(self._samples[name], dtype=np.float64), self._counts[name])
+                        for name in stages if name in self._samples}
+
+        summary = {}
+        for name, (samples, count) in snapshot.items():
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            summary[name] = {
+                "count": count,
+                "window": len(samples),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(samples.max()), 3)
+            }
+        return summary
+
+    def render_prometheus(self, name: str = "cycleguard_stage_duration_seconds") -> List[str]:
+        """Cumulative per-stage histograms in the Prometheus text format"""
+        with self._lock:
+            snapshot = [(stage, list(self._bucket_counts[stage]), self._sums[stage], self._counts[stage])
+                        for stage in self._samples]
+
+        lines = [
+            f"# HELP {name} Duration of each pipeline stage and API route",
+            f"# TYPE {name} histogram"
+        ]
+        for stage, bucket_counts, total, count in snapshot:
+            label = _escape_label(stage)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{label}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{label}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{label}"}} {count}')
+        return lines
+
+
+# Process-wide latencies reported by /api/health and /metrics
+stage_latencies = StageLatencies(settings.latency_window_size)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time the with-block as one sample of stage
+
+    The duration goes into the process-wide statistics and, when a request
+    is being traced, into that request's timings (repeated stages add up).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        stage_latencies.observe(stage, duration_ms)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + duration_ms
+
+
+def timed(stage: str):
+    """Decorator form of span() for service methods (sync or async)"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Start collecting span timings for the current request (context)"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def request_timings() -> Dict[str, float]:
+    """Span timings (ms, rounded) recorded so far for the current request"""
+    timings = _request_timings.get() or {}
+    return {stage: round(duration_ms, 3) for stage, duration_ms in timings.items()}
+
+
+def log_timings(record: dict):
+    """Emit one structured (JSON) log line"""
+    if settings.timing_logs:
+        print(json.dumps(record, separators=(",", ":")))
+
+
+def render_gauges(gauges: Dict[str, tuple]) -> List[str]:
+    """Gauges {name: (help, value)} in the Prometheus text format"""
+    lines = []
+    for name, (help_text, value) in gauges.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(value)}")
+    return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")